@@ -4,4 +4,6 @@ class ContasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'contas'
     verbose_name = 'Contas a Pagar'
-
+    
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,82 @@
+import hashlib
+import time
+from functools import wraps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.response import Response
+from .models import VersaoRelatorio
+
+# Com a versão na chave, o tempo só limita o espaço ocupado: nada expira por estar desatualizado
+TEMPO_CACHE = getattr(settings, 'CACHE_RELATORIOS_TIMEOUT', 60 * 60 * 24)
+
+
+def versao_dados(usuario):
+    """Versão atual dos dados de relatório do usuário (0 se nunca houve gravação)"""
+    return VersaoRelatorio.objects.filter(usuario=usuario).values_list('versao', flat=True).first() or 0
+
+
+def invalidar_relatorios(usuario_ids):
+    """Incrementa a versão dos usuários; as entradas antigas do cache deixam de ser lidas"""
+    usuario_ids = set(usuario_ids)
+    if not usuario_ids:
+        return
+    atualizados = set(
+        VersaoRelatorio.objects.filter(usuario_id__in=usuario_ids).values_list('usuario_id', flat=True)
+    )
+    VersaoRelatorio.objects.filter(usuario_id__in=atualizados).update(versao=F('versao') + 1)
+    VersaoRelatorio.objects.bulk_create(
+        [VersaoRelatorio(usuario_id=usuario_id, versao=1) for usuario_id in usuario_ids - atualizados],
+        ignore_conflicts=True
+    )
+
+
+def invalidar_relatorios_de_todos():
+    """Usado quando muda um dado compartilhado entre usuários (as categorias)"""
+    transaction.on_commit(lambda: invalidar_relatorios(User.objects.values_list('id', flat=True)))
+
+
+def chave_cache(request):
+    """Chave por usuário, versão dos dados, endpoint, parâmetros e data de hoje (padrão de vários relatórios)"""
+    parametros = sorted(request.query_params.lists())
+    # A URL absoluta entra na chave porque as respostas paginadas trazem links next/previous
+    url = request.build_absolute_uri(request.path)
+    assinatura = hashlib.md5(f'{url}|{parametros}|{timezone.localdate()}'.encode()).hexdigest()
+    return f'relatorio:{request.user.pk}:{versao_dados(request.user)}:{assinatura}'
+
+
+def cache_relatorio(acao):
+    """
+    Guarda no cache as respostas 200 de uma ação de relatório.
+
+    A chave inclui a versão dos dados do usuário, incrementada a cada
+    gravação de contas, despesas ou categorias, então uma entrada nunca é
+    servida depois que os dados mudam. Funciona com qualquer backend
+    (locmem, arquivo, ...), pois só usa get/set.
+
+    O cabeçalho Server-Timing informa se a resposta veio do cache; no HIT,
+    com a duração da leitura (chave + get).
+    """
+    @wraps(acao)
+    def envoltorio(self, request, *args, **kwargs):
+        inicio = time.perf_counter()
+        chave = chave_cache(request)
+        dados = cache.get(chave)
+        if dados is not None:
+            response = Response(dados)
+            response['X-Cache'] = 'HIT'
+            response['Server-Timing'] = f'cache;desc=hit;dur={(time.perf_counter() - inicio) * 1000:.1f}'
+            return response
+
+        response = acao(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(chave, response.data, TEMPO_CACHE)
+        response['X-Cache'] = 'MISS'
+        # Mantém as durações das seções que a ação já informou
+        response['Server-Timing'] = ', '.join(filter(None, ['cache;desc=miss', response.get('Server-Timing')]))
+        return response
+
+    return envoltorio
@@ -0,0 +1,123 @@
+"""
+Comparação de um mês com o mesmo mês do ano anterior e com as médias dos
+3, 6 e 12 meses anteriores, a partir do ResumoMensal.
+
+O ResumoMensal só tem linha nos meses com movimento, então uma janela
+"3 linhas anteriores" não corresponde a "3 meses anteriores". Em vez
+disso, cada categoria recebe a soma acumulada mês a mês (função de janela
+no PostgreSQL; soma corrente em Python nos demais bancos) e a soma de
+qualquer intervalo de meses sai da diferença entre dois acumulados, em uma
+única leitura dos 12 meses anteriores.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import Decimal
+from django.db import connection
+from django.db.models import F, Sum, Window
+from .models import ResumoMensal
+from .resumos import filtro_meses
+from .utils import adicionar_meses
+
+JANELAS = (3, 6, 12)
+METRICAS = ('contas', 'despesas')
+CENTAVO = Decimal('0.01')
+
+
+def _indice(ano, mes):
+    return ano * 12 + mes - 1
+
+
+def _acumulados(usuario, primeiro_mes, ultimo_mes):
+    """{categoria_id: (índices dos meses, acumulado de contas, acumulado de despesas)} em ordem de mês"""
+    resumos = ResumoMensal.objects.filter(usuario=usuario).filter(
+        filtro_meses(primeiro_mes, ultimo_mes)
+    ).order_by('categoria_id', 'ano', 'mes')
+
+    if connection.vendor == 'postgresql':
+        ordem = [F('ano').asc(), F('mes').asc()]
+        linhas = resumos.annotate(
+            acumulado_contas=Window(Sum('total_contas'), partition_by=[F('categoria_id')], order_by=ordem),
+            acumulado_despesas=Window(Sum('total_despesas'), partition_by=[F('categoria_id')], order_by=ordem)
+        ).values_list('categoria_id', 'ano', 'mes', 'acumulado_contas', 'acumulado_despesas')
+    else:
+        linhas = _somas_correntes(
+            resumos.values_list('categoria_id', 'ano', 'mes', 'total_contas', 'total_despesas')
+        )
+
+    series = defaultdict(lambda: ([], [], []))
+    for categoria_id, ano, mes, contas, despesas in linhas:
+        indices, acumulado_contas, acumulado_despesas = series[categoria_id]
+        indices.append(_indice(ano, mes))
+        acumulado_contas.append(contas)
+        acumulado_despesas.append(despesas)
+    return series
+
+
+def _somas_correntes(linhas):
+    """Equivalente em Python das funções de janela: linhas ordenadas por categoria e mês"""
+    categoria_atual = None
+    for categoria_id, ano, mes, contas, despesas in linhas:
+        if categoria_id != categoria_atual:
+            categoria_atual = categoria_id
+            acumulado_contas = acumulado_despesas = Decimal('0')
+        acumulado_contas += contas
+        acumulado_despesas += despesas
+        yield categoria_id, ano, mes, acumulado_contas, acumulado_despesas
+
+
+def _soma_intervalo(indices, acumulados, inicio, fim):
+    """Soma dos meses de índice inicio..fim (inclusive) a partir dos acumulados"""
+    def ate(indice):
+        posicao = bisect_right(indices, indice)
+        return acumulados[posicao - 1] if posicao else Decimal('0')
+    return ate(fim) - ate(inicio - 1)
+
+
+def _comparativo(indices, acumulados, referencia):
+    comparativo = {'ano_anterior': _soma_intervalo(indices, acumulados, referencia - 12, referencia - 12)}
+    for meses in JANELAS:
+        soma = _soma_intervalo(indices, acumulados, referencia - meses, referencia - 1)
+        comparativo[f'media_{meses}_meses'] = (soma / meses).quantize(CENTAVO)
+    return comparativo
+
+
+def comparativo_vazio():
+    return {'ano_anterior': Decimal('0'), **{f'media_{meses}_meses': Decimal('0') for meses in JANELAS}}
+
+
+def somar_comparativos(*comparativos):
+    total = comparativo_vazio()
+    for comparativo in comparativos:
+        for campo, valor in comparativo.items():
+            total[campo] += valor
+    return total
+
+
+def comparativos_mensais(usuario, mes):
+    """
+    Comparativos do mês que começa em `mes` (uma data no dia 1).
+
+    Para contas e despesas, por categoria e no total, retorna o valor do
+    mesmo mês no ano anterior (ano_anterior) e as médias mensais dos 3, 6 e
+    12 meses anteriores (media_3_meses, ...; meses sem movimento contam
+    como zero). Formato: {'categorias': {categoria_id: {'contas': {...},
+    'despesas': {...}}}, 'total': {'contas': {...}, 'despesas': {...}}}.
+    """
+    referencia = _indice(mes.year, mes.month)
+    series = _acumulados(usuario, adicionar_meses(mes, -max(JANELAS)), adicionar_meses(mes, -1))
+
+    categorias = {
+        categoria_id: {
+            'contas': _comparativo(indices, acumulado_contas, referencia),
+            'despesas': _comparativo(indices, acumulado_despesas, referencia),
+        }
+        for categoria_id, (indices, acumulado_contas, acumulado_despesas) in series.items()
+    }
+    # Médias e somas são lineares: o total é a soma das categorias
+    return {
+        'categorias': categorias,
+        'total': {
+            metrica: somar_comparativos(*(comparativo[metrica] for comparativo in categorias.values()))
+            for metrica in METRICAS
+        },
+    }
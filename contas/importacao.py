@@ -0,0 +1,272 @@
+import csv
+import unicodedata
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from fornecedores.models import Fornecedor
+from .models import Categoria, ContaPagar, DespesaDiaria
+from .resumos import agendar_recalculo
+
+TAMANHO_LOTE = 1000
+MAXIMO_ERROS_RELATORIO = 1000
+VALOR_MAXIMO = Decimal('99999999.99')  # max_digits=10, decimal_places=2
+
+# Nome normalizado da coluna -> campo do modelo
+COLUNAS_CONTAS = {
+    'descricao': 'descricao',
+    'valor': 'valor',
+    'vencimento': 'data_vencimento',
+    'data_vencimento': 'data_vencimento',
+    'data_de_vencimento': 'data_vencimento',
+    'status': 'status',
+    'categoria': 'categoria',
+    'fornecedor': 'fornecedor',
+    'observacoes': 'observacoes',
+    'data_pagamento': 'data_pagamento',
+    'data_de_pagamento': 'data_pagamento',
+    'valor_pago': 'valor_pago',
+}
+
+COLUNAS_DESPESAS = {
+    'descricao': 'descricao',
+    'valor': 'valor',
+    'data': 'data',
+    'categoria': 'categoria',
+    'observacoes': 'observacoes',
+}
+
+
+def normalizar(texto):
+    """Remove acentos, espaços nas pontas e diferença de caixa (para comparar nomes)"""
+    texto = unicodedata.normalize('NFKD', (texto or '').replace('\ufeff', ''))
+    return ''.join(c for c in texto if not unicodedata.combining(c)).strip().casefold()
+
+
+def _converter_valor(texto):
+    """Aceita '1.234,56' (pt-BR) e '1234.56'"""
+    texto = (texto or '').strip().replace('R$', '').strip()
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    valor = Decimal(texto)
+    if not valor.is_finite():
+        raise InvalidOperation
+    return valor
+
+
+def _converter_data(texto):
+    """Aceita 'dd/mm/aaaa' e 'aaaa-mm-dd'"""
+    texto = (texto or '').strip()
+    for formato in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(texto)
+
+
+class ImportadorCSV:
+    """
+    Importa contas a pagar ou despesas diárias de um arquivo CSV (o mesmo
+    layout gerado pelas exportações também é aceito).
+
+    O arquivo é lido linha a linha; categorias e fornecedores são resolvidos
+    por nome através de mapas montados uma única vez por importação, e as
+    linhas válidas são gravadas em lotes com `executemany`. Linhas inválidas
+    não interrompem a importação: entram no relatório de erros.
+
+    Toda a importação é uma única transação (um erro no meio do arquivo não
+    deixa metade gravada) e os resumos mensais dos meses tocados são
+    recalculados uma única vez, no commit.
+    """
+
+    def __init__(self, tipo, usuario, simular=False):
+        if tipo not in ('contas', 'despesas'):
+            raise ValueError('Tipo de importação deve ser "contas" ou "despesas"')
+        self.tipo = tipo
+        self.usuario = usuario
+        self.simular = simular
+        self.colunas = COLUNAS_CONTAS if tipo == 'contas' else COLUNAS_DESPESAS
+        self.modelo = ContaPagar if tipo == 'contas' else DespesaDiaria
+        self.campo_data = 'data_vencimento' if tipo == 'contas' else 'data'
+
+        self.categorias = {
+            normalizar(nome): categoria_id
+            for categoria_id, nome in Categoria.objects.filter(ativo=True).values_list('id', 'nome')
+        }
+        self.fornecedores = {}
+        if tipo == 'contas':
+            for fornecedor_id, nome, documento in Fornecedor.objects.filter(
+                usuario=usuario
+            ).values_list('id', 'nome', 'cnpj_cpf'):
+                self.fornecedores[normalizar(nome)] = fornecedor_id
+                self.fornecedores[normalizar(documento)] = fornecedor_id
+
+    def importar(self, linhas):
+        """Processa um iterável de linhas de texto e retorna o relatório da importação"""
+        linhas = iter(linhas)
+        primeira = next(linhas, '')
+        delimitador = ';' if primeira.count(';') >= primeira.count(',') else ','
+        leitor = csv.reader(self._reencadear(primeira, linhas), delimiter=delimitador)
+
+        cabecalho = next(leitor, [])
+        campos = [self.colunas.get(normalizar(coluna).replace(' ', '_')) for coluna in cabecalho]
+        faltando = {'descricao', 'valor', 'categoria', 'data_vencimento' if self.tipo == 'contas' else 'data'} - set(campos)
+        if faltando:
+            return {
+                'importados': 0,
+                'total_linhas': 0,
+                'total_erros': 1,
+                'erros': [{'linha': 1, 'erros': [f'Colunas obrigatórias ausentes: {", ".join(sorted(faltando))}']}],
+                'simulacao': self.simular,
+            }
+
+        with transaction.atomic():
+            return self._importar_linhas(leitor, campos)
+
+    def _importar_linhas(self, leitor, campos):
+        relatorio = {'importados': 0, 'total_linhas': 0, 'total_erros': 0, 'erros': [], 'simulacao': self.simular}
+        insercao = None if self.simular else self._preparar_insercao()
+        chaves = set()
+        lote = []
+
+        while True:
+            # Um campo entre aspas pode ocupar várias linhas do arquivo: o
+            # registro começa na linha seguinte à última lida
+            numero = leitor.line_num + 1
+            linha = next(leitor, None)
+            if linha is None:
+                break
+            if not any(valor.strip() for valor in linha):
+                continue
+            relatorio['total_linhas'] += 1
+
+            dados = {campo: valor for campo, valor in zip(campos, linha) if campo}
+            valores, erros = self._validar(dados)
+            if erros:
+                relatorio['total_erros'] += 1
+                if len(relatorio['erros']) < MAXIMO_ERROS_RELATORIO:
+                    relatorio['erros'].append({'linha': numero, 'erros': erros})
+                continue
+
+            lote.append(valores)
+            if len(lote) >= TAMANHO_LOTE:
+                relatorio['importados'] += self._gravar(insercao, lote, chaves)
+                lote = []
+
+        if lote:
+            relatorio['importados'] += self._gravar(insercao, lote, chaves)
+
+        agendar_recalculo(chaves)
+        return relatorio
+
+    @staticmethod
+    def _reencadear(primeira, restantes):
+        yield primeira
+        yield from restantes
+
+    def _validar(self, dados):
+        """Valida uma linha e retorna (valores dos campos do modelo, lista de erros)"""
+        erros = []
+        campos = {'observacoes': (dados.get('observacoes') or '').strip()}
+
+        descricao = (dados.get('descricao') or '').strip()
+        if not descricao:
+            erros.append('Descrição é obrigatória')
+        elif len(descricao) > 200:
+            erros.append('Descrição deve ter no máximo 200 caracteres')
+        campos['descricao'] = descricao
+
+        try:
+            campos['valor'] = _converter_valor(dados.get('valor'))
+            if not Decimal('0') < campos['valor'] <= VALOR_MAXIMO:
+                erros.append('Valor deve ser positivo e menor que 100 milhões')
+        except InvalidOperation:
+            erros.append(f'Valor inválido: {dados.get("valor")!r}')
+
+        try:
+            campos[self.campo_data] = _converter_data(dados.get(self.campo_data))
+        except ValueError:
+            erros.append(f'Data inválida: {dados.get(self.campo_data)!r} (use dd/mm/aaaa ou aaaa-mm-dd)')
+
+        categoria_id = self.categorias.get(normalizar(dados.get('categoria')))
+        if categoria_id is None:
+            erros.append(f'Categoria não encontrada: {dados.get("categoria")!r}')
+        campos['categoria_id'] = categoria_id
+
+        if self.tipo == 'contas':
+            erros.extend(self._validar_campos_conta(dados, campos))
+
+        if erros:
+            return None, erros
+        return campos, []
+
+    def _validar_campos_conta(self, dados, campos):
+        erros = []
+
+        status = normalizar(dados.get('status')) or 'pendente'
+        if status not in dict(ContaPagar.STATUS_CHOICES):
+            erros.append(f'Status inválido: {dados.get("status")!r}')
+        campos['status'] = status
+
+        fornecedor = (dados.get('fornecedor') or '').strip()
+        if fornecedor:
+            campos['fornecedor_id'] = self.fornecedores.get(normalizar(fornecedor))
+            if campos['fornecedor_id'] is None:
+                erros.append(f'Fornecedor não encontrado: {fornecedor!r}')
+
+        if (dados.get('data_pagamento') or '').strip():
+            try:
+                campos['data_pagamento'] = _converter_data(dados['data_pagamento'])
+            except ValueError:
+                erros.append(f'Data de pagamento inválida: {dados["data_pagamento"]!r}')
+
+        if (dados.get('valor_pago') or '').strip():
+            try:
+                campos['valor_pago'] = _converter_valor(dados['valor_pago'])
+            except InvalidOperation:
+                erros.append(f'Valor pago inválido: {dados["valor_pago"]!r}')
+
+        return erros
+
+    def _preparar_insercao(self):
+        """
+        INSERT de uma linha do modelo para o executemany, com os valores dos
+        campos que o CSV não preenche (usuário, padrões, criado_em) já
+        convertidos para o banco.
+
+        O bulk_create criaria uma instância por linha e montaria o SQL de
+        poucas linhas por vez (limite de parâmetros do SQLite): em arquivos
+        grandes, era o que mais pesava na importação.
+        """
+        conexao = transaction.get_connection()
+        modelo = self.modelo(usuario=self.usuario)
+        campos = [campo for campo in self.modelo._meta.concrete_fields if not campo.primary_key]
+        fixos = {
+            campo.attname: campo.get_db_prep_save(campo.pre_save(modelo, True), conexao)
+            for campo in campos
+        }
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            conexao.ops.quote_name(self.modelo._meta.db_table),
+            ', '.join(conexao.ops.quote_name(campo.column) for campo in campos),
+            ', '.join(['%s'] * len(campos))
+        )
+        return conexao, sql, campos, fixos
+
+    def _gravar(self, insercao, lote, chaves):
+        if self.simular:
+            return len(lote)
+        conexao, sql, campos, fixos = insercao
+        with conexao.cursor() as cursor:
+            cursor.executemany(sql, [
+                [
+                    campo.get_db_prep_save(valores[campo.attname], conexao) if campo.attname in valores
+                    else fixos[campo.attname]
+                    for campo in campos
+                ]
+                for valores in lote
+            ])
+        chaves.update(
+            (self.usuario.pk, valores['categoria_id'], valores[self.campo_data].year, valores[self.campo_data].month)
+            for valores in lote
+        )
+        return len(lote)
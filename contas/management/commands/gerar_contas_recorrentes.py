@@ -1,11 +1,13 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime
 from contas.models import ContaPagar
-from django.contrib.auth.models import User
+from contas.resumos import agendar_recalculo, chave_resumo
+from contas.utils import MESES_RECORRENCIA, DIAS_RECORRENCIA, datas_recorrencia
 
 class Command(BaseCommand):
-    help = 'Gera contas recorrentes automaticamente'
+    help = 'Gera contas recorrentes automaticamente (inclusive os períodos atrasados)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -13,110 +15,126 @@ class Command(BaseCommand):
             action='store_true',
             help='Mostra o que seria gerado sem criar as contas',
         )
+        parser.add_argument(
+            '--data',
+            help='Gera as ocorrências com vencimento até esta data (AAAA-MM-DD). Padrão: hoje',
+        )
+        parser.add_argument(
+            '--tamanho-lote',
+            type=int,
+            default=1000,
+            help='Quantidade de contas recorrentes processadas por transação',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
-        
-        # Buscar contas recorrentes que precisam ser geradas
-        contas_recorrentes = ContaPagar.objects.filter(
+        self.verbosity = options['verbosity']
+        tamanho_lote = options['tamanho_lote']
+
+        if options['data']:
+            try:
+                hoje = datetime.strptime(options['data'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Data inválida, use AAAA-MM-DD')
+        else:
+            hoje = timezone.localdate()
+
+        # Usa o índice parcial de proxima_geracao: só entram as séries com algo a gerar
+        recorrentes = ContaPagar.objects.filter(
             eh_recorrente=True,
-            tipo_recorrencia__isnull=False
-        )
-        
+            tipo_recorrencia__in=list(MESES_RECORRENCIA) + list(DIAS_RECORRENCIA),
+            proxima_geracao__lte=hoje
+        ).order_by('id')
+
         contas_geradas = 0
-        
-        for conta in contas_recorrentes:
-            # Verificar se a data de fim da recorrência não foi atingida
-            if conta.data_fim_recorrencia and conta.data_fim_recorrencia < timezone.now().date():
-                continue
-                
-            # Calcular próxima data baseada no tipo de recorrência
-            proxima_data = self.calcular_proxima_data(conta)
-            
-            # Se a próxima data é hoje ou no passado, gerar nova conta
-            if proxima_data <= timezone.now().date():
-                if not dry_run:
-                    self.gerar_conta_recorrente(conta, proxima_data)
-                contas_geradas += 1
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Gerando conta recorrente: {conta.descricao} - {proxima_data}'
-                    )
-                )
-        
+        series_processadas = 0
+        ultimo_id = 0
+
+        # Paginação por id: cada lote é lido e gravado separadamente
+        while True:
+            lote = list(recorrentes.filter(id__gt=ultimo_id)[:tamanho_lote])
+            if not lote:
+                break
+            ultimo_id = lote[-1].id
+
+            contas_geradas += self.processar_lote(lote, hoje, dry_run, tamanho_lote)
+            series_processadas += len(lote)
+
         if dry_run:
             self.stdout.write(
                 self.style.WARNING(
-                    f'DRY RUN: {contas_geradas} contas seriam geradas'
+                    f'DRY RUN: {contas_geradas} contas seriam geradas ({series_processadas} contas recorrentes)'
                 )
             )
         else:
             self.stdout.write(
                 self.style.SUCCESS(
-                    f'{contas_geradas} contas recorrentes foram geradas'
+                    f'{contas_geradas} contas recorrentes foram geradas ({series_processadas} contas recorrentes)'
                 )
             )
 
-    def calcular_proxima_data(self, conta):
-        """Calcula a próxima data baseada no tipo de recorrência"""
-        data_base = conta.data_vencimento
-        
-        if conta.tipo_recorrencia == 'semanal':
-            return data_base + timedelta(days=7)
-        elif conta.tipo_recorrencia == 'quinzenal':
-            return data_base + timedelta(days=15)
-        elif conta.tipo_recorrencia == 'mensal':
-            return self.adicionar_meses(data_base, 1)
-        elif conta.tipo_recorrencia == 'bimestral':
-            return self.adicionar_meses(data_base, 2)
-        elif conta.tipo_recorrencia == 'trimestral':
-            return self.adicionar_meses(data_base, 3)
-        elif conta.tipo_recorrencia == 'semestral':
-            return self.adicionar_meses(data_base, 6)
-        elif conta.tipo_recorrencia == 'anual':
-            return self.adicionar_meses(data_base, 12)
-        
-        return data_base
-
-    def adicionar_meses(self, data, meses):
-        """Adiciona meses a uma data, mantendo o dia do mês quando possível"""
-        ano = data.year
-        mes = data.month + meses
-        
-        # Ajustar ano se necessário
-        while mes > 12:
-            ano += 1
-            mes -= 12
-        
-        # Tentar manter o mesmo dia do mês
-        try:
-            return data.replace(year=ano, month=mes)
-        except ValueError:
-            # Se o dia não existe no mês (ex: 31 em fevereiro), usar o último dia do mês
-            from calendar import monthrange
-            ultimo_dia = monthrange(ano, mes)[1]
-            return data.replace(year=ano, month=mes, day=ultimo_dia)
-
-    def gerar_conta_recorrente(self, conta_original, nova_data):
-        """Gera uma nova conta baseada na conta recorrente original"""
-        nova_conta = ContaPagar.objects.create(
+    def processar_lote(self, recorrentes, hoje, dry_run, tamanho_lote):
+        """Gera todas as ocorrências vencidas de um lote de contas recorrentes"""
+        agora = timezone.now()
+        inicio = min(conta.proxima_geracao for conta in recorrentes)
+        ocorrencias = []
+
+        for conta in recorrentes:
+            limite = min(hoje, conta.data_fim_recorrencia) if conta.data_fim_recorrencia else hoje
+
+            for data in datas_recorrencia(conta.data_vencimento, conta.tipo_recorrencia, conta.proxima_geracao):
+                if data > limite:
+                    break
+                ocorrencias.append(self.nova_ocorrencia(conta, data))
+
+            # Série encerrada sai do índice de proxima_geracao
+            if conta.data_fim_recorrencia and data > conta.data_fim_recorrencia:
+                data = None
+            conta.proxima_geracao = data
+            # bulk_update não aplica o auto_now
+            conta.atualizado_em = agora
+
+        # Ocorrências que já existem (execução anterior interrompida) não são contadas de novo
+        existentes = set(
+            ContaPagar.objects.filter(
+                conta_recorrente__in=recorrentes,
+                data_vencimento__range=(inicio, hoje)
+            ).values_list('conta_recorrente_id', 'data_vencimento')
+        )
+        ocorrencias = [
+            ocorrencia for ocorrencia in ocorrencias
+            if (ocorrencia.conta_recorrente_id, ocorrencia.data_vencimento) not in existentes
+        ]
+
+        if self.verbosity >= 2:
+            for ocorrencia in ocorrencias:
+                self.stdout.write(f'Gerando conta recorrente: {ocorrencia.descricao} - {ocorrencia.data_vencimento}')
+
+        if not dry_run:
+            with transaction.atomic():
+                # ignore_conflicts protege contra duas execuções simultâneas
+                ContaPagar.objects.bulk_create(ocorrencias, batch_size=tamanho_lote, ignore_conflicts=True)
+                agendar_recalculo(chave_resumo(ocorrencia) for ocorrencia in ocorrencias)
+                ContaPagar.objects.bulk_update(
+                    recorrentes, ['proxima_geracao', 'atualizado_em'], batch_size=tamanho_lote
+                )
+
+        return len(ocorrencias)
+
+    def nova_ocorrencia(self, conta_original, data_vencimento):
+        """Monta (sem salvar) uma nova conta baseada na conta recorrente original"""
+        return ContaPagar(
             descricao=conta_original.descricao,
             valor=conta_original.valor,
-            data_vencimento=nova_data,
+            data_vencimento=data_vencimento,
             status='pendente',
-            categoria=conta_original.categoria,
-            fornecedor=conta_original.fornecedor,
-            usuario=conta_original.usuario,
+            categoria_id=conta_original.categoria_id,
+            fornecedor_id=conta_original.fornecedor_id,
+            usuario_id=conta_original.usuario_id,
             observacoes=conta_original.observacoes,
             eh_recorrente=False,  # A nova conta não é recorrente
             tipo_recorrencia=None,
             data_fim_recorrencia=None,
-            proxima_geracao=None
+            proxima_geracao=None,
+            conta_recorrente_id=conta_original.id
         )
-        
-        # Atualizar a próxima geração da conta original
-        proxima_data = self.calcular_proxima_data(nova_conta)
-        conta_original.proxima_geracao = proxima_data
-        conta_original.save()
-        
-        return nova_conta 
\ No newline at end of file
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from contas.importacao import ImportadorCSV
+
+class Command(BaseCommand):
+    help = 'Importa contas a pagar ou despesas diárias de um arquivo CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=['contas', 'despesas'], help='O que importar')
+        parser.add_argument('arquivo', help='Caminho do arquivo CSV (UTF-8, separado por ; ou ,)')
+        parser.add_argument(
+            '--usuario',
+            required=True,
+            help='Username do dono dos registros importados',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Valida o arquivo sem gravar nada',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f'Usuário não encontrado: {options["usuario"]}')
+
+        importador = ImportadorCSV(options['tipo'], usuario, simular=options['dry_run'])
+
+        try:
+            with open(options['arquivo'], encoding='utf-8-sig', newline='') as arquivo:
+                relatorio = importador.importar(arquivo)
+        except OSError as erro:
+            raise CommandError(f'Não foi possível ler o arquivo: {erro}')
+        except UnicodeDecodeError:
+            raise CommandError('O arquivo deve estar codificado em UTF-8')
+
+        for erro in relatorio['erros']:
+            self.stdout.write(
+                self.style.ERROR(f'Linha {erro["linha"]}: {"; ".join(erro["erros"])}')
+            )
+        if relatorio['total_erros'] > len(relatorio['erros']):
+            self.stdout.write(
+                self.style.WARNING(f'... e mais {relatorio["total_erros"] - len(relatorio["erros"])} linhas com erro')
+            )
+
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'DRY RUN: {relatorio["importados"]} de {relatorio["total_linhas"]} linhas seriam importadas'
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'{relatorio["importados"]} de {relatorio["total_linhas"]} linhas foram importadas'
+                )
+            )
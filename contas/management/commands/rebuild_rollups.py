@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from contas.resumos import reconstruir_resumos
+
+class Command(BaseCommand):
+    help = 'Reconstrói os resumos mensais (ResumoMensal) a partir das contas e despesas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            help='Reconstrói apenas os resumos deste usuário (username)',
+        )
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f'Usuário não encontrado: {options["usuario"]}')
+
+        quantidade = reconstruir_resumos(usuario)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'{quantidade} resumos mensais foram reconstruídos')
+        )
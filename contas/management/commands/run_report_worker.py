@@ -0,0 +1,53 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from contas.tarefas import executar_tarefa, expirar_tarefas, liberar_travadas, reservar_proxima
+
+class Command(BaseCommand):
+    help = 'Processa a fila de tarefas de relatório (TarefaRelatorio) fora dos processos web'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--uma-vez',
+            action='store_true',
+            help='Processa as tarefas pendentes e termina, em vez de aguardar novas',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=5,
+            help='Segundos entre as consultas à fila quando ela está vazia',
+        )
+
+    def handle(self, *args, **options):
+        intervalo = options['intervalo']
+
+        while True:
+            # Conexões velhas ou quebradas são reabertas a cada volta, como em uma requisição
+            close_old_connections()
+            self.manutencao()
+
+            processadas = 0
+            while True:
+                tarefa = reservar_proxima()
+                if tarefa is None:
+                    break
+                executar_tarefa(tarefa)
+                processadas += 1
+                if tarefa.status == 'concluido':
+                    self.stdout.write(self.style.SUCCESS(f'Tarefa {tarefa.pk} ({tarefa.tipo}) concluída'))
+                else:
+                    self.stdout.write(self.style.ERROR(f'Tarefa {tarefa.pk} ({tarefa.tipo}) falhou: {tarefa.erro}'))
+
+            if options['uma_vez']:
+                self.stdout.write(self.style.SUCCESS(f'{processadas} tarefa(s) processada(s)'))
+                return
+            time.sleep(intervalo)
+
+    def manutencao(self):
+        liberadas = liberar_travadas()
+        if liberadas:
+            self.stdout.write(self.style.WARNING(f'{liberadas} tarefa(s) interrompida(s) voltaram para a fila'))
+        expiradas = expirar_tarefas()
+        if expiradas:
+            self.stdout.write(f'{expiradas} arquivo(s) de relatório expirado(s) removido(s)')
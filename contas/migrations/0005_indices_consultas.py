@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contas', '0004_contapagar_data_fim_recorrencia_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contapagar',
+            index=models.Index(fields=['usuario', 'status', 'data_vencimento'], name='conta_usuario_status_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contapagar',
+            index=models.Index(fields=['usuario', 'data_vencimento'], name='conta_usuario_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contapagar',
+            index=models.Index(condition=models.Q(('status', 'pendente')), fields=['usuario', 'data_vencimento'], name='conta_pendente_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contapagar',
+            index=models.Index(condition=models.Q(('eh_recorrente', True)), fields=['usuario'], name='conta_recorrente_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='despesadiaria',
+            index=models.Index(fields=['usuario', 'data'], name='despesa_usuario_data_idx'),
+        ),
+    ]
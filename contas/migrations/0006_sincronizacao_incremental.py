@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contas', '0005_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroExclusao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('contapagar', 'Conta a Pagar'), ('despesadiaria', 'Despesa Diária')], max_length=20, verbose_name='Modelo')),
+                ('objeto_id', models.BigIntegerField(verbose_name='ID do Objeto')),
+                ('excluido_em', models.DateTimeField(auto_now_add=True, verbose_name='Excluído em')),
+            ],
+            options={
+                'verbose_name': 'Registro de Exclusão',
+                'verbose_name_plural': 'Registros de Exclusão',
+            },
+        ),
+        migrations.AddField(
+            model_name='despesadiaria',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, verbose_name='Atualizado em'),
+        ),
+        migrations.AddIndex(
+            model_name='contapagar',
+            index=models.Index(fields=['usuario', 'atualizado_em', 'id'], name='conta_usuario_atualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='despesadiaria',
+            index=models.Index(fields=['usuario', 'atualizado_em', 'id'], name='despesa_usuario_atualizado_idx'),
+        ),
+        migrations.AddField(
+            model_name='registroexclusao',
+            name='usuario',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL, verbose_name='Usuário'),
+        ),
+        migrations.AddIndex(
+            model_name='registroexclusao',
+            index=models.Index(fields=['usuario', 'modelo', 'excluido_em'], name='exclusao_usuario_modelo_idx'),
+        ),
+    ]
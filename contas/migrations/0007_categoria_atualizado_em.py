@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contas', '0006_sincronizacao_incremental'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, verbose_name='Atualizado em'),
+        ),
+    ]
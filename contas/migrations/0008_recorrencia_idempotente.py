@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+from contas.utils import MESES_RECORRENCIA, DIAS_RECORRENCIA, datas_recorrencia
+
+
+def preencher_proxima_geracao(apps, schema_editor):
+    """
+    Posiciona as séries existentes na próxima ocorrência a partir de hoje.
+
+    As ocorrências geradas pelo comando antigo não têm vínculo com a conta de
+    origem, então recuperar os períodos passados criaria duplicatas delas.
+    """
+    ContaPagar = apps.get_model('contas', 'ContaPagar')
+    hoje = timezone.localdate()
+    tipos = list(MESES_RECORRENCIA) + list(DIAS_RECORRENCIA)
+
+    contas = list(ContaPagar.objects.filter(eh_recorrente=True, tipo_recorrencia__in=tipos))
+    for conta in contas:
+        # O comando antigo guardava em proxima_geracao a ocorrência ainda não gerada
+        a_partir_de = max(conta.proxima_geracao or hoje, hoje)
+        proxima = next(datas_recorrencia(conta.data_vencimento, conta.tipo_recorrencia, a_partir_de))
+        if conta.data_fim_recorrencia and proxima > conta.data_fim_recorrencia:
+            proxima = None
+        conta.proxima_geracao = proxima
+
+    ContaPagar.objects.bulk_update(contas, ['proxima_geracao'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contas', '0007_categoria_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contapagar',
+            name='conta_recorrente',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ocorrencias', to='contas.contapagar', verbose_name='Conta Recorrente de Origem'),
+        ),
+        migrations.AddIndex(
+            model_name='contapagar',
+            index=models.Index(condition=models.Q(('eh_recorrente', True)), fields=['proxima_geracao'], name='conta_proxima_geracao_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='contapagar',
+            constraint=models.UniqueConstraint(condition=models.Q(('conta_recorrente__isnull', False)), fields=('conta_recorrente', 'data_vencimento'), name='conta_ocorrencia_unica'),
+        ),
+        migrations.RunPython(preencher_proxima_geracao, migrations.RunPython.noop),
+    ]
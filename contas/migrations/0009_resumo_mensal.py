@@ -0,0 +1,108 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:32
+
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def _calcular_resumos(ContaPagar, DespesaDiaria):
+    """
+    {(usuario_id, categoria_id, ano, mes): valores} das contas e despesas.
+
+    Cópia da agregação de contas/resumos.py nesta migração, para que ela não
+    mude junto com o código da aplicação.
+    """
+    chave = ['usuario_id', 'categoria_id', 'ano', 'mes']
+    campos_contas = [
+        'contas_pendentes', 'contas_pagas', 'total_contas',
+        'quantidade_contas', 'quantidade_contas_pendentes', 'quantidade_contas_pagas',
+    ]
+    campos_despesas = ['total_despesas', 'quantidade_despesas']
+    valores = defaultdict(lambda: {
+        campo: (0 if campo.startswith('quantidade') else Decimal('0'))
+        for campo in campos_contas + campos_despesas
+    })
+
+    pagas = Q(status='pago')
+    contas = ContaPagar.objects.order_by().annotate(
+        ano=ExtractYear('data_vencimento'), mes=ExtractMonth('data_vencimento')
+    ).values(*chave).annotate(
+        contas_pendentes=Sum('valor', filter=Q(status='pendente')),
+        contas_pagas=Sum('valor', filter=pagas),
+        total_contas=Sum('valor'),
+        quantidade_contas=Count('id'),
+        quantidade_contas_pendentes=Count('id', filter=Q(status='pendente')),
+        quantidade_contas_pagas=Count('id', filter=pagas)
+    )
+    despesas = DespesaDiaria.objects.order_by().annotate(
+        ano=ExtractYear('data'), mes=ExtractMonth('data')
+    ).values(*chave).annotate(
+        total_despesas=Sum('valor'),
+        quantidade_despesas=Count('id')
+    )
+
+    for linhas, campos in ((contas, campos_contas), (despesas, campos_despesas)):
+        for linha in linhas.iterator(chunk_size=2000):
+            destino = valores[tuple(linha[campo] for campo in chave)]
+            for campo in campos:
+                destino[campo] += linha[campo] or 0
+    return valores
+
+
+def preencher_resumos(apps, schema_editor):
+    """Carga inicial dos resumos a partir das contas e despesas existentes"""
+    ContaPagar = apps.get_model('contas', 'ContaPagar')
+    DespesaDiaria = apps.get_model('contas', 'DespesaDiaria')
+    ResumoMensal = apps.get_model('contas', 'ResumoMensal')
+
+    valores = _calcular_resumos(ContaPagar, DespesaDiaria)
+    ResumoMensal.objects.bulk_create(
+        [
+            ResumoMensal(usuario_id=usuario_id, categoria_id=categoria_id, ano=ano, mes=mes, **dados)
+            for (usuario_id, categoria_id, ano, mes), dados in valores.items()
+        ],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contas', '0008_recorrencia_idempotente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.PositiveSmallIntegerField(verbose_name='Ano')),
+                ('mes', models.PositiveSmallIntegerField(verbose_name='Mês')),
+                ('contas_pendentes', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Contas Pendentes')),
+                ('contas_pagas', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Contas Pagas')),
+                ('total_contas', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total de Contas')),
+                ('quantidade_contas', models.IntegerField(default=0, verbose_name='Quantidade de Contas')),
+                ('quantidade_contas_pendentes', models.IntegerField(default=0, verbose_name='Quantidade de Contas Pendentes')),
+                ('quantidade_contas_pagas', models.IntegerField(default=0, verbose_name='Quantidade de Contas Pagas')),
+                ('total_despesas', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total de Despesas')),
+                ('quantidade_despesas', models.IntegerField(default=0, verbose_name='Quantidade de Despesas')),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contas.categoria', verbose_name='Categoria')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Resumo Mensal',
+                'verbose_name_plural': 'Resumos Mensais',
+                'indexes': [models.Index(fields=['usuario', 'ano', 'mes'], name='resumo_usuario_mes_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumomensal',
+            constraint=models.UniqueConstraint(fields=('usuario', 'categoria', 'ano', 'mes'), name='resumo_mensal_unico'),
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
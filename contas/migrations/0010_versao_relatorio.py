@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('contas', '0009_resumo_mensal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoRelatorio',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+                ('versao', models.BigIntegerField(default=0, verbose_name='Versão')),
+            ],
+            options={
+                'verbose_name': 'Versão de Relatório',
+                'verbose_name_plural': 'Versões de Relatório',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contas', '0010_versao_relatorio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarefaRelatorio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('mensal', 'Mensal'), ('por_categoria', 'Por Categoria'), ('fluxo_caixa', 'Fluxo de Caixa'), ('evolucao_gastos', 'Evolução de Gastos')], max_length=20, verbose_name='Tipo')),
+                ('formato', models.CharField(choices=[('json', 'JSON'), ('csv', 'CSV')], default='json', max_length=4, verbose_name='Formato')),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Parâmetros')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluido', 'Concluído'), ('erro', 'Erro'), ('expirado', 'Expirado')], default='pendente', max_length=15, verbose_name='Status')),
+                ('arquivo', models.FileField(blank=True, upload_to='relatorios/%Y/%m/', verbose_name='Arquivo')),
+                ('erro', models.TextField(blank=True, verbose_name='Erro')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('concluido_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('expira_em', models.DateTimeField(blank=True, null=True, verbose_name='Expira em')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Tarefa de Relatório',
+                'verbose_name_plural': 'Tarefas de Relatório',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['status', 'criado_em'], name='tarefa_relatorio_fila_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:20
+
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def _calcular_resumos(ContaPagar, DespesaDiaria):
+    """
+    {(usuario_id, categoria_id, ano, mes): valores} das contas e despesas.
+
+    Cópia da agregação de contas/resumos.py nesta migração, para que ela não
+    mude junto com o código da aplicação.
+    """
+    chave = ['usuario_id', 'categoria_id', 'ano', 'mes']
+    campos_contas = [
+        'contas_pendentes', 'contas_pagas', 'total_contas',
+        'quantidade_contas', 'quantidade_contas_pendentes', 'quantidade_contas_pagas',
+    ]
+    campos_despesas = ['total_despesas', 'quantidade_despesas']
+    valores = defaultdict(lambda: {
+        campo: (0 if campo.startswith('quantidade') else Decimal('0'))
+        for campo in campos_contas + campos_despesas
+    })
+
+    pagas = ~Q(status='pendente')
+    contas = ContaPagar.objects.order_by().annotate(
+        ano=ExtractYear('data_vencimento'), mes=ExtractMonth('data_vencimento')
+    ).values(*chave).annotate(
+        contas_pendentes=Sum('valor', filter=Q(status='pendente')),
+        contas_pagas=Sum('valor', filter=pagas),
+        total_contas=Sum('valor'),
+        quantidade_contas=Count('id'),
+        quantidade_contas_pendentes=Count('id', filter=Q(status='pendente')),
+        quantidade_contas_pagas=Count('id', filter=pagas)
+    )
+    despesas = DespesaDiaria.objects.order_by().annotate(
+        ano=ExtractYear('data'), mes=ExtractMonth('data')
+    ).values(*chave).annotate(
+        total_despesas=Sum('valor'),
+        quantidade_despesas=Count('id')
+    )
+
+    for linhas, campos in ((contas, campos_contas), (despesas, campos_despesas)):
+        for linha in linhas.iterator(chunk_size=2000):
+            destino = valores[tuple(linha[campo] for campo in chave)]
+            for campo in campos:
+                destino[campo] += linha[campo] or 0
+    return valores
+
+
+def recalcular_resumos(apps, schema_editor):
+    """contas_pagas passou a incluir as contas vencidas e canceladas: refaz os resumos"""
+    ContaPagar = apps.get_model('contas', 'ContaPagar')
+    DespesaDiaria = apps.get_model('contas', 'DespesaDiaria')
+    ResumoMensal = apps.get_model('contas', 'ResumoMensal')
+    VersaoRelatorio = apps.get_model('contas', 'VersaoRelatorio')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    valores = _calcular_resumos(ContaPagar, DespesaDiaria)
+    ResumoMensal.objects.all().delete()
+    ResumoMensal.objects.bulk_create(
+        [
+            ResumoMensal(usuario_id=usuario_id, categoria_id=categoria_id, ano=ano, mes=mes, **dados)
+            for (usuario_id, categoria_id, ano, mes), dados in valores.items()
+        ],
+        batch_size=500
+    )
+
+    # Relatórios já em cache foram montados com os totais antigos
+    VersaoRelatorio.objects.update(versao=F('versao') + 1)
+    VersaoRelatorio.objects.bulk_create(
+        [
+            VersaoRelatorio(usuario_id=usuario_id, versao=1)
+            for usuario_id in User.objects.exclude(versaorelatorio__isnull=False).values_list('id', flat=True)
+        ],
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contas', '0011_tarefa_relatorio'),
+    ]
+
+    operations = [
+        migrations.RunPython(recalcular_resumos, migrations.RunPython.noop),
+    ]
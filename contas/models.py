@@ -6,6 +6,7 @@ class Categoria(models.Model):
     nome = models.CharField(max_length=100, verbose_name='Nome')
     cor = models.CharField(max_length=7, default='#007bff', verbose_name='Cor')
     ativo = models.BooleanField(default=True, verbose_name='Ativo')
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
     
     class Meta:
         verbose_name = 'Categoria'
@@ -81,6 +82,14 @@ class ContaPagar(models.Model):
         blank=True, 
         verbose_name='Próxima Geração'
     )
+    conta_recorrente = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ocorrencias',
+        verbose_name='Conta Recorrente de Origem'
+    )
     
     # Controle
     observacoes = models.TextField(blank=True, verbose_name='Observações')
@@ -95,6 +104,34 @@ class ContaPagar(models.Model):
         ordering = ['data_vencimento']
         verbose_name = 'Conta a Pagar'
         verbose_name_plural = 'Contas a Pagar'
+        indexes = [
+            models.Index(fields=['usuario', 'status', 'data_vencimento'], name='conta_usuario_status_venc_idx'),
+            models.Index(fields=['usuario', 'data_vencimento'], name='conta_usuario_venc_idx'),
+            models.Index(
+                fields=['usuario', 'data_vencimento'],
+                name='conta_pendente_venc_idx',
+                condition=models.Q(status='pendente')
+            ),
+            models.Index(
+                fields=['usuario'],
+                name='conta_recorrente_idx',
+                condition=models.Q(eh_recorrente=True)
+            ),
+            models.Index(fields=['usuario', 'atualizado_em', 'id'], name='conta_usuario_atualizado_idx'),
+            models.Index(
+                fields=['proxima_geracao'],
+                name='conta_proxima_geracao_idx',
+                condition=models.Q(eh_recorrente=True)
+            ),
+        ]
+        constraints = [
+            # Uma única ocorrência por vencimento: a geração pode rodar de novo sem duplicar
+            models.UniqueConstraint(
+                fields=['conta_recorrente', 'data_vencimento'],
+                name='conta_ocorrencia_unica',
+                condition=models.Q(conta_recorrente__isnull=False)
+            ),
+        ]
     
     def __str__(self):
         if self.eh_parcelado and self.numero_parcelas > 1:
@@ -134,11 +171,16 @@ class DespesaDiaria(models.Model):
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Usuário')
     observacoes = models.TextField(blank=True, verbose_name='Observações')
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
     
     class Meta:
         ordering = ['-data']
         verbose_name = 'Despesa Diária'
         verbose_name_plural = 'Despesas Diárias'
+        indexes = [
+            models.Index(fields=['usuario', 'data'], name='despesa_usuario_data_idx'),
+            models.Index(fields=['usuario', 'atualizado_em', 'id'], name='despesa_usuario_atualizado_idx'),
+        ]
     
     def __str__(self):
         return f"{self.descricao} - {self.data}"
@@ -147,3 +189,133 @@ class DespesaDiaria(models.Model):
         """Retorna o valor formatado em reais"""
         return f"R$ {self.valor:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
 
+
+
+class RegistroExclusao(models.Model):
+    """Marca (tombstone) de registros excluídos, usada pela sincronização incremental"""
+    MODELO_CHOICES = [
+        ('contapagar', 'Conta a Pagar'),
+        ('despesadiaria', 'Despesa Diária'),
+    ]
+    
+    modelo = models.CharField(max_length=20, choices=MODELO_CHOICES, verbose_name='Modelo')
+    objeto_id = models.BigIntegerField(verbose_name='ID do Objeto')
+    # Sem constraint: as marcas são gravadas durante a exclusão em cascata do próprio usuário
+    usuario = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, verbose_name='Usuário')
+    excluido_em = models.DateTimeField(auto_now_add=True, verbose_name='Excluído em')
+    
+    class Meta:
+        verbose_name = 'Registro de Exclusão'
+        verbose_name_plural = 'Registros de Exclusão'
+        indexes = [
+            models.Index(fields=['usuario', 'modelo', 'excluido_em'], name='exclusao_usuario_modelo_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id} - {self.excluido_em}"
+
+class ResumoMensal(models.Model):
+    """
+    Totais pré-agregados por usuário, categoria e mês, lidos pelos relatórios.
+
+    Mantido pelos sinais de ContaPagar/DespesaDiaria e pelas operações em
+    lote (ver contas.resumos); `manage.py rebuild_rollups` o reconstrói.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Usuário')
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, verbose_name='Categoria')
+    ano = models.PositiveSmallIntegerField(verbose_name='Ano')
+    mes = models.PositiveSmallIntegerField(verbose_name='Mês')
+    
+    # Contas a pagar, pela data de vencimento
+    contas_pendentes = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Contas Pendentes')
+    contas_pagas = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Contas Pagas')
+    total_contas = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Total de Contas')
+    quantidade_contas = models.IntegerField(default=0, verbose_name='Quantidade de Contas')
+    quantidade_contas_pendentes = models.IntegerField(default=0, verbose_name='Quantidade de Contas Pendentes')
+    quantidade_contas_pagas = models.IntegerField(default=0, verbose_name='Quantidade de Contas Pagas')
+    
+    # Despesas diárias
+    total_despesas = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Total de Despesas')
+    quantidade_despesas = models.IntegerField(default=0, verbose_name='Quantidade de Despesas')
+    
+    class Meta:
+        verbose_name = 'Resumo Mensal'
+        verbose_name_plural = 'Resumos Mensais'
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'categoria', 'ano', 'mes'], name='resumo_mensal_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['usuario', 'ano', 'mes'], name='resumo_usuario_mes_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.usuario} - {self.categoria} - {self.mes:02d}/{self.ano}"
+
+class VersaoRelatorio(models.Model):
+    """
+    Versão dos dados de relatório de cada usuário, usada na chave do cache.
+
+    Fica no banco (e não no próprio cache) para que gravações feitas por
+    outros processos, como os comandos de importação e geração, invalidem
+    também caches locais (locmem) dos processos web.
+    """
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, verbose_name='Usuário')
+    versao = models.BigIntegerField(default=0, verbose_name='Versão')
+    
+    class Meta:
+        verbose_name = 'Versão de Relatório'
+        verbose_name_plural = 'Versões de Relatório'
+    
+    def __str__(self):
+        return f"{self.usuario} - v{self.versao}"
+
+class TarefaRelatorio(models.Model):
+    """
+    Relatório calculado fora da requisição pelo worker (run_report_worker).
+
+    O resultado fica em um arquivo JSON ou CSV compactado com gzip em
+    MEDIA_ROOT/relatorios e é apagado quando a tarefa expira.
+    """
+    TIPO_CHOICES = [
+        ('mensal', 'Mensal'),
+        ('por_categoria', 'Por Categoria'),
+        ('fluxo_caixa', 'Fluxo de Caixa'),
+        ('evolucao_gastos', 'Evolução de Gastos'),
+    ]
+    
+    FORMATO_CHOICES = [
+        ('json', 'JSON'),
+        ('csv', 'CSV'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('concluido', 'Concluído'),
+        ('erro', 'Erro'),
+        ('expirado', 'Expirado'),
+    ]
+    
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Usuário')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name='Tipo')
+    formato = models.CharField(max_length=4, choices=FORMATO_CHOICES, default='json', verbose_name='Formato')
+    parametros = models.JSONField(default=dict, blank=True, verbose_name='Parâmetros')
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pendente', verbose_name='Status')
+    arquivo = models.FileField(upload_to='relatorios/%Y/%m/', blank=True, verbose_name='Arquivo')
+    erro = models.TextField(blank=True, verbose_name='Erro')
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
+    iniciado_em = models.DateTimeField(null=True, blank=True, verbose_name='Iniciado em')
+    concluido_em = models.DateTimeField(null=True, blank=True, verbose_name='Concluído em')
+    expira_em = models.DateTimeField(null=True, blank=True, verbose_name='Expira em')
+    
+    class Meta:
+        verbose_name = 'Tarefa de Relatório'
+        verbose_name_plural = 'Tarefas de Relatório'
+        ordering = ['-criado_em']
+        indexes = [
+            # Fila do worker: pendentes mais antigas primeiro
+            models.Index(fields=['status', 'criado_em'], name='tarefa_relatorio_fila_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.pk} - {self.get_status_display()}"
@@ -0,0 +1,127 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Count, Sum
+from .models import ContaPagar
+from .utils import MESES_RECORRENCIA, DIAS_RECORRENCIA, adicionar_meses, datas_recorrencia
+
+GRANULARIDADES = ('dia', 'semana', 'mes')
+# Contas que ainda vão sair do caixa. Os resumos mensais (resumos._agregar_contas)
+# mantêm o critério dos relatórios originais e somam as vencidas em contas_pagas
+STATUS_EM_ABERTO = ('pendente', 'vencido')
+
+
+def inicio_periodo(data, granularidade):
+    """Primeiro dia do período (dia, semana começando na segunda ou mês) que contém a data"""
+    if granularidade == 'semana':
+        return data - timedelta(days=data.weekday())
+    if granularidade == 'mes':
+        return data.replace(day=1)
+    return data
+
+
+def proximo_periodo(data, granularidade):
+    if granularidade == 'semana':
+        return data + timedelta(days=7)
+    if granularidade == 'mes':
+        return adicionar_meses(data, 1)
+    return data + timedelta(days=1)
+
+
+def _series_recorrentes(usuario, inicio, fim):
+    """
+    Agrupa as contas recorrentes que produzem exatamente as mesmas datas na
+    janela e soma seus valores.
+
+    A partir da primeira ocorrência na janela, a sequência de datas depende
+    só do tipo de recorrência, do dia do vencimento original (para as
+    mensais) e da data final. Milhares de contas costumam se reduzir a
+    poucas centenas de séries, e cada série é expandida uma única vez.
+    """
+    recorrentes = ContaPagar.objects.filter(
+        usuario=usuario,
+        eh_recorrente=True,
+        tipo_recorrencia__in=list(MESES_RECORRENCIA) + list(DIAS_RECORRENCIA),
+        proxima_geracao__isnull=False,
+        proxima_geracao__lte=fim
+    ).exclude(
+        data_fim_recorrencia__lt=inicio
+    ).values_list('data_vencimento', 'tipo_recorrencia', 'data_fim_recorrencia', 'proxima_geracao', 'valor')
+
+    series = {}
+    for vencimento, tipo, data_fim, proxima, valor in recorrentes.iterator(chunk_size=2000):
+        # Antes de proxima_geracao as ocorrências já existem como contas lançadas
+        primeira = next(datas_recorrencia(vencimento, tipo, max(proxima, inicio)))
+        limite = min(fim, data_fim) if data_fim else fim
+        if primeira > limite:
+            continue
+
+        dia = vencimento.day if tipo in MESES_RECORRENCIA else None
+        chave = (tipo, dia, primeira, limite)
+        if chave not in series:
+            series[chave] = [vencimento, Decimal('0'), 0]
+        series[chave][1] += valor
+        series[chave][2] += 1
+
+    return series
+
+
+def projetar_fluxo_caixa(usuario, inicio, fim, granularidade='mes'):
+    """
+    Projeta as saídas de caixa entre `inicio` e `fim`, agrupadas por período.
+
+    Soma as contas em aberto já lançadas (inclusive parcelas e ocorrências
+    recorrentes já geradas) e as ocorrências futuras das contas recorrentes,
+    calculadas em memória a partir de `proxima_geracao`. Nada é gravado.
+    """
+    periodos = {}
+    data = inicio_periodo(inicio, granularidade)
+    while data <= fim:
+        periodos[data] = {
+            'inicio': data,
+            'lancado': Decimal('0'),
+            'recorrente': Decimal('0'),
+            'quantidade_lancadas': 0,
+            'quantidade_recorrentes': 0,
+        }
+        data = proximo_periodo(data, granularidade)
+
+    em_aberto = ContaPagar.objects.filter(usuario=usuario, status__in=STATUS_EM_ABERTO)
+
+    lancadas = (
+        em_aberto.filter(data_vencimento__range=(inicio, fim))
+        .order_by()
+        .values('data_vencimento')
+        .annotate(total=Sum('valor'), quantidade=Count('id'))
+    )
+    for linha in lancadas:
+        periodo = periodos[inicio_periodo(linha['data_vencimento'], granularidade)]
+        periodo['lancado'] += linha['total']
+        periodo['quantidade_lancadas'] += linha['quantidade']
+
+    for (tipo, _, primeira, limite), (vencimento, valor, quantidade) in _series_recorrentes(usuario, inicio, fim).items():
+        for data in datas_recorrencia(vencimento, tipo, primeira):
+            if data > limite:
+                break
+            periodo = periodos[inicio_periodo(data, granularidade)]
+            periodo['recorrente'] += valor
+            periodo['quantidade_recorrentes'] += quantidade
+
+    atrasado = em_aberto.filter(data_vencimento__lt=inicio).aggregate(
+        total=Sum('valor'), quantidade=Count('id')
+    )
+
+    resultado = []
+    for periodo in periodos.values():
+        periodo['total'] = periodo['lancado'] + periodo['recorrente']
+        resultado.append(periodo)
+
+    return {
+        'periodos': resultado,
+        'resumo': {
+            'total_lancado': sum((p['lancado'] for p in resultado), Decimal('0')),
+            'total_recorrente': sum((p['recorrente'] for p in resultado), Decimal('0')),
+            'total': sum((p['total'] for p in resultado), Decimal('0')),
+            'atrasado': atrasado['total'] or Decimal('0'),
+            'quantidade_atrasadas': atrasado['quantidade'],
+        }
+    }
@@ -0,0 +1,341 @@
+"""
+Cálculo dos relatórios, independente da requisição HTTP.
+
+Cada relatório tem um leitor de parâmetros (recebe um dicionário ou
+QueryDict e gera ValueError com a mensagem para o usuário), a função que
+calcula o resultado e a tabela usada na exportação em CSV. O
+RelatorioViewSet e o worker de tarefas (run_report_worker) usam as mesmas
+funções através de RELATORIOS.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from django.db.models import F, Sum
+from django.utils import timezone
+from core.paralelo import executar_secoes
+from .comparativos import comparativo_vazio, comparativos_mensais, somar_comparativos
+from .models import ResumoMensal
+from .projecao import GRANULARIDADES, projetar_fluxo_caixa
+from .resumos import filtro_meses, totais_por_categoria
+from .utils import adicionar_meses
+
+
+def _data(valor):
+    return datetime.strptime(str(valor), '%Y-%m-%d').date()
+
+
+# Leitura de parâmetros
+
+def ler_parametros_mensal(parametros):
+    """mes/ano (padrão: mês atual)"""
+    hoje = timezone.localdate()
+    try:
+        mes = int(parametros.get('mes', hoje.month))
+        ano = int(parametros.get('ano', hoje.year))
+        data_inicio = date(ano, mes, 1)
+        data_fim = adicionar_meses(data_inicio, 1) - timedelta(days=1)
+    except (TypeError, ValueError):
+        raise ValueError('Informe mes (1 a 12) e ano válidos')
+    return {'mes': mes, 'ano': ano, 'data_inicio': data_inicio, 'data_fim': data_fim}
+
+
+def ler_parametros_por_categoria(parametros):
+    """data_inicial/data_final (padrão: últimos 6 meses até hoje)"""
+    try:
+        data_final = _data(parametros['data_final']) if parametros.get('data_final') else timezone.localdate()
+        data_inicial = _data(parametros['data_inicial']) if parametros.get('data_inicial') else data_final - timedelta(days=180)
+    except (TypeError, ValueError):
+        raise ValueError('Use datas no formato AAAA-MM-DD')
+    if data_inicial > data_final:
+        raise ValueError('data_inicial deve ser anterior a data_final')
+    return {'data_inicial': data_inicial, 'data_final': data_final}
+
+
+def ler_parametros_fluxo_caixa(parametros):
+    """meses (1 a 36), granularidade (dia, semana, mes) e data_inicial (padrão: hoje)"""
+    granularidade = parametros.get('granularidade', 'mes')
+    try:
+        meses = int(parametros.get('meses', 12))
+        inicio = _data(parametros['data_inicial']) if parametros.get('data_inicial') else timezone.localdate()
+    except (TypeError, ValueError):
+        raise ValueError('Parâmetros inválidos: meses deve ser um número e data_inicial AAAA-MM-DD')
+    if granularidade not in GRANULARIDADES or not 1 <= meses <= 36:
+        raise ValueError('Use granularidade dia, semana ou mes e meses entre 1 e 36')
+    return {'inicio': inicio, 'fim': adicionar_meses(inicio, meses) - timedelta(days=1), 'granularidade': granularidade}
+
+
+def ler_parametros_evolucao(parametros):
+    """meses (1 a 120), terminando no mês atual"""
+    try:
+        meses = int(parametros.get('meses', 6))
+    except (TypeError, ValueError):
+        meses = 0
+    if not 1 <= meses <= 120:
+        raise ValueError('meses deve ser um número entre 1 e 120')
+    return {'meses': meses}
+
+
+# Cálculo
+
+def relatorio_mensal(usuario, mes, ano, data_inicio, data_fim, tempos=None):
+    """
+    Resumo do mês e totais por categoria, lidos do ResumoMensal, com o
+    comparativo (mesmo mês do ano anterior e médias dos 3, 6 e 12 meses
+    anteriores) por categoria e no resumo.
+    """
+    # Uma linha por categoria com movimento no mês
+    consulta = ResumoMensal.objects.filter(usuario=usuario, ano=ano, mes=mes).values(
+        'categoria_id', 'total_contas', 'contas_pendentes', 'contas_pagas', 'quantidade_contas',
+        'total_despesas', 'quantidade_despesas',
+        nome=F('categoria__nome'),
+        cor=F('categoria__cor')
+    )
+    secoes = executar_secoes({
+        'resumos': lambda: list(consulta),
+        'comparativos': lambda: comparativos_mensais(usuario, data_inicio),
+    }, tempos)
+    resumos = secoes['resumos']
+    comparativos = secoes['comparativos']
+    sem_historico = {'contas': comparativo_vazio(), 'despesas': comparativo_vazio()}
+
+    contas_por_categoria = sorted(
+        (
+            {
+                'nome': resumo['nome'],
+                'cor': resumo['cor'],
+                'pendente': resumo['contas_pendentes'],
+                'pago': resumo['contas_pagas'],
+                'total': resumo['total_contas'],
+                'quantidade': resumo['quantidade_contas'],
+                'comparativo': comparativos['categorias'].get(resumo['categoria_id'], sem_historico)['contas']
+            }
+            for resumo in resumos if resumo['quantidade_contas']
+        ),
+        key=lambda cat: (-cat['total'], cat['nome'])
+    )
+    despesas_por_categoria = sorted(
+        (
+            {
+                'nome': resumo['nome'],
+                'cor': resumo['cor'],
+                'total': resumo['total_despesas'],
+                'quantidade': resumo['quantidade_despesas'],
+                'comparativo': comparativos['categorias'].get(resumo['categoria_id'], sem_historico)['despesas']
+            }
+            for resumo in resumos if resumo['quantidade_despesas']
+        ),
+        key=lambda cat: (-cat['total'], cat['nome'])
+    )
+
+    total_contas_pendentes = sum((cat['pendente'] for cat in contas_por_categoria), Decimal('0'))
+    total_contas_pagas = sum((cat['pago'] for cat in contas_por_categoria), Decimal('0'))
+    total_despesas = sum((cat['total'] for cat in despesas_por_categoria), Decimal('0'))
+
+    return {
+        'periodo': {
+            'mes': mes,
+            'ano': ano,
+            'data_inicio': data_inicio,
+            'data_fim': data_fim
+        },
+        'resumo': {
+            'contas_pendentes': total_contas_pendentes,
+            'contas_pagas': total_contas_pagas,
+            'total_contas': total_contas_pendentes + total_contas_pagas,
+            'despesas': total_despesas,
+            'saldo': (total_contas_pagas - total_despesas),
+            'comparativo': {
+                'total_contas': comparativos['total']['contas'],
+                'despesas': comparativos['total']['despesas']
+            }
+        },
+        'contas_por_categoria': contas_por_categoria,
+        'despesas_por_categoria': despesas_por_categoria
+    }
+
+
+def relatorio_por_categoria(usuario, data_inicial, data_final, tempos=None):
+    """
+    Totais de contas e despesas por categoria em um período qualquer.
+
+    O comparativo de cada categoria (e do resumo) traz o total geral do
+    mesmo período um ano antes (ano_anterior) e as médias mensais dos 3, 6
+    e 12 meses anteriores ao mês de data_inicial.
+    """
+    # Meses inteiros vêm do ResumoMensal; só as pontas do período leem as contas/despesas
+    secoes = executar_secoes({
+        'periodo': lambda: totais_por_categoria(usuario, data_inicial, data_final),
+        'ano_anterior': lambda: totais_por_categoria(
+            usuario, adicionar_meses(data_inicial, -12), adicionar_meses(data_final, -12)
+        ),
+        'medias': lambda: comparativos_mensais(usuario, data_inicial.replace(day=1)),
+    }, tempos)
+    anteriores = {
+        categoria_id: totais['total_contas'] + totais['total_despesas']
+        for categoria_id, totais in secoes['ano_anterior'].items()
+    }
+
+    def comparativo(medias, ano_anterior):
+        return {**somar_comparativos(medias['contas'], medias['despesas']), 'ano_anterior': ano_anterior}
+
+    sem_historico = {'contas': comparativo_vazio(), 'despesas': comparativo_vazio()}
+    resultado = []
+    for categoria_id, totais in secoes['periodo'].items():
+        total_categoria = totais['total_contas'] + totais['total_despesas']
+        resultado.append({
+            'nome': totais['nome'],
+            'cor': totais['cor'],
+            'contas_pendentes': totais['contas_pendentes'],
+            'contas_pagas': totais['contas_pagas'],
+            'total_contas': totais['total_contas'],
+            'quantidade_contas': totais['quantidade_contas'],
+            'despesas': totais['total_despesas'],
+            'quantidade_despesas': totais['quantidade_despesas'],
+            'total_geral': total_categoria,
+            'percentual_contas': (totais['total_contas'] / total_categoria * 100) if total_categoria > 0 else 0,
+            'percentual_despesas': (totais['total_despesas'] / total_categoria * 100) if total_categoria > 0 else 0,
+            'comparativo': comparativo(
+                secoes['medias']['categorias'].get(categoria_id, sem_historico),
+                anteriores.get(categoria_id, Decimal('0'))
+            )
+        })
+
+    # Ordenar por total geral
+    resultado.sort(key=lambda x: x['total_geral'], reverse=True)
+
+    return {
+        'periodo': {
+            'inicio': data_inicial,
+            'fim': data_final
+        },
+        'categorias': resultado,
+        'resumo': {
+            'total_contas': sum((cat['total_contas'] for cat in resultado), Decimal('0')),
+            'total_despesas': sum((cat['despesas'] for cat in resultado), Decimal('0')),
+            'total_geral': sum((cat['total_geral'] for cat in resultado), Decimal('0')),
+            'comparativo': comparativo(secoes['medias']['total'], sum(anteriores.values(), Decimal('0')))
+        }
+    }
+
+
+def relatorio_fluxo_caixa(usuario, inicio, fim, granularidade, tempos=None):
+    """Projeção das contas a pagar, incluindo as recorrências ainda não geradas"""
+    projecao = executar_secoes(
+        {'projecao': lambda: projetar_fluxo_caixa(usuario, inicio, fim, granularidade)}, tempos
+    )['projecao']
+    return {
+        'periodo': {
+            'inicio': inicio,
+            'fim': fim,
+            'granularidade': granularidade
+        },
+        **projecao
+    }
+
+
+def relatorio_evolucao_gastos(usuario, meses, tempos=None):
+    """Totais mês a mês (meses do calendário no fuso do sistema), terminando no mês atual"""
+    mes_atual = timezone.localdate().replace(day=1)
+    primeiro_mes = adicionar_meses(mes_atual, -(meses - 1))
+
+    # Uma consulta agrupada sobre o ResumoMensal, qualquer que seja a quantidade de meses
+    consulta = ResumoMensal.objects.filter(usuario=usuario).filter(
+        filtro_meses(primeiro_mes, mes_atual)
+    ).values('ano', 'mes').annotate(
+        contas=Sum('total_contas'),
+        quantidade_contas=Sum('quantidade_contas'),
+        despesas=Sum('total_despesas'),
+        quantidade_despesas=Sum('quantidade_despesas')
+    ).order_by()
+    por_mes = {
+        date(linha['ano'], linha['mes'], 1): linha
+        for linha in executar_secoes({'resumos': lambda: list(consulta)}, tempos)['resumos']
+    }
+
+    # Meses sem lançamentos entram zerados
+    vazio = {'contas': 0, 'despesas': 0, 'quantidade_contas': 0, 'quantidade_despesas': 0}
+    meses_dados = []
+    for i in range(meses):
+        mes_inicio = adicionar_meses(primeiro_mes, i)
+        dados_mes = por_mes.get(mes_inicio, vazio)
+
+        meses_dados.append({
+            'mes': mes_inicio.strftime('%B/%Y'),
+            'mes_numero': mes_inicio.month,
+            'ano': mes_inicio.year,
+            'contas': float(dados_mes['contas']),
+            'despesas': float(dados_mes['despesas']),
+            'total': float(dados_mes['contas'] + dados_mes['despesas']),
+            'quantidade_contas': dados_mes['quantidade_contas'],
+            'quantidade_despesas': dados_mes['quantidade_despesas']
+        })
+
+    return {
+        'periodo_meses': meses,
+        'dados': meses_dados,
+        'resumo': {
+            'total_contas': sum(mes['contas'] for mes in meses_dados),
+            'total_despesas': sum(mes['despesas'] for mes in meses_dados),
+            'total_geral': sum(mes['total'] for mes in meses_dados),
+            'media_mensal_contas': sum(mes['contas'] for mes in meses_dados) / len(meses_dados),
+            'media_mensal_despesas': sum(mes['despesas'] for mes in meses_dados) / len(meses_dados)
+        }
+    }
+
+
+# Tabelas para exportação em CSV: (cabeçalho, linhas)
+
+def tabela_mensal(dados):
+    linhas = [
+        ('Contas', cat['nome'], cat['pendente'], cat['pago'], cat['total'], cat['quantidade'])
+        for cat in dados['contas_por_categoria']
+    ] + [
+        ('Despesas', cat['nome'], None, None, cat['total'], cat['quantidade'])
+        for cat in dados['despesas_por_categoria']
+    ]
+    return ['Tipo', 'Categoria', 'Pendente', 'Pago', 'Total', 'Quantidade'], linhas
+
+
+def tabela_por_categoria(dados):
+    return [
+        'Categoria', 'Contas Pendentes', 'Contas Pagas', 'Total Contas', 'Quantidade Contas',
+        'Despesas', 'Quantidade Despesas', 'Total Geral'
+    ], [
+        (cat['nome'], cat['contas_pendentes'], cat['contas_pagas'], cat['total_contas'], cat['quantidade_contas'],
+         cat['despesas'], cat['quantidade_despesas'], cat['total_geral'])
+        for cat in dados['categorias']
+    ]
+
+
+def tabela_fluxo_caixa(dados):
+    return ['Início', 'Lançado', 'Recorrente', 'Total', 'Quantidade Lançadas', 'Quantidade Recorrentes'], [
+        (periodo['inicio'], periodo['lancado'], periodo['recorrente'], periodo['total'],
+         periodo['quantidade_lancadas'], periodo['quantidade_recorrentes'])
+        for periodo in dados['periodos']
+    ]
+
+
+def tabela_evolucao_gastos(dados):
+    # Os valores deste relatório são float; Decimal garante a vírgula decimal no CSV
+    return ['Mês', 'Ano', 'Contas', 'Despesas', 'Total', 'Quantidade Contas', 'Quantidade Despesas'], [
+        (mes['mes_numero'], mes['ano'], Decimal(str(mes['contas'])), Decimal(str(mes['despesas'])),
+         Decimal(str(mes['total'])), mes['quantidade_contas'], mes['quantidade_despesas'])
+        for mes in dados['dados']
+    ]
+
+
+RELATORIOS = {
+    'mensal': (ler_parametros_mensal, relatorio_mensal, tabela_mensal),
+    'por_categoria': (ler_parametros_por_categoria, relatorio_por_categoria, tabela_por_categoria),
+    'fluxo_caixa': (ler_parametros_fluxo_caixa, relatorio_fluxo_caixa, tabela_fluxo_caixa),
+    'evolucao_gastos': (ler_parametros_evolucao, relatorio_evolucao_gastos, tabela_evolucao_gastos),
+}
+
+
+def gerar_relatorio(tipo, usuario, parametros, tempos=None):
+    """
+    Lê os parâmetros e calcula o relatório `tipo`. Gera ValueError se os
+    parâmetros forem inválidos. A duração de cada seção, em milissegundos,
+    é gravada em `tempos` quando informado.
+    """
+    ler, gerar, _ = RELATORIOS[tipo]
+    return gerar(usuario, tempos=tempos, **ler(parametros))
@@ -0,0 +1,266 @@
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+from core.paralelo import executar_secoes
+from .cache_relatorios import invalidar_relatorios
+from .models import ContaPagar, DespesaDiaria, ResumoMensal
+from .utils import adicionar_meses
+
+TAMANHO_LOTE = 500
+CAMPOS_CONTAS = [
+    'contas_pendentes', 'contas_pagas', 'total_contas',
+    'quantidade_contas', 'quantidade_contas_pendentes', 'quantidade_contas_pagas',
+]
+CAMPOS_DESPESAS = ['total_despesas', 'quantidade_despesas']
+CAMPOS_RESUMO = CAMPOS_CONTAS + CAMPOS_DESPESAS
+
+# Chaves alteradas na transação corrente, recalculadas uma única vez no commit
+_pendentes = threading.local()
+
+
+def _valores_zerados():
+    return {campo: (0 if campo.startswith('quantidade') else Decimal('0')) for campo in CAMPOS_RESUMO}
+
+
+def _somar(destino, linha, campos):
+    for campo in campos:
+        destino[campo] += linha[campo] or 0
+
+
+def _agregar_contas(queryset, agrupar_por):
+    """
+    Totais de contas agrupados pelos campos de `agrupar_por` (aceita 'ano' e
+    'mes'). Como nos relatórios originais, toda conta que não está pendente
+    (paga, vencida ou cancelada) entra em contas_pagas, então pendentes +
+    pagas = total. A projeção de fluxo de caixa (projecao.STATUS_EM_ABERTO)
+    usa outro critério de propósito: lá uma conta vencida ainda vai sair do
+    caixa e conta como em aberto.
+    """
+    nao_pendente = ~Q(status='pendente')
+    return queryset.order_by().annotate(
+        ano=ExtractYear('data_vencimento'),
+        mes=ExtractMonth('data_vencimento')
+    ).values(*agrupar_por).annotate(
+        contas_pendentes=Sum('valor', filter=Q(status='pendente')),
+        contas_pagas=Sum('valor', filter=nao_pendente),
+        total_contas=Sum('valor'),
+        quantidade_contas=Count('id'),
+        quantidade_contas_pendentes=Count('id', filter=Q(status='pendente')),
+        quantidade_contas_pagas=Count('id', filter=nao_pendente)
+    )
+
+
+def _agregar_despesas(queryset, agrupar_por):
+    """Totais de despesas agrupados pelos campos de `agrupar_por` (aceita 'ano' e 'mes')"""
+    return queryset.order_by().annotate(
+        ano=ExtractYear('data'),
+        mes=ExtractMonth('data')
+    ).values(*agrupar_por).annotate(
+        total_despesas=Sum('valor'),
+        quantidade_despesas=Count('id')
+    )
+
+
+def chave_resumo(objeto):
+    """Chave (usuario_id, categoria_id, ano, mes) do resumo afetado por uma conta ou despesa"""
+    data = objeto.data_vencimento if isinstance(objeto, ContaPagar) else objeto.data
+    return (objeto.usuario_id, objeto.categoria_id, data.year, data.month)
+
+
+def chaves_do_queryset(queryset):
+    """Chaves de resumo de todos os registros de um queryset de contas ou despesas"""
+    campo = 'data_vencimento' if queryset.model is ContaPagar else 'data'
+    return set(
+        queryset.order_by().annotate(
+            ano=ExtractYear(campo),
+            mes=ExtractMonth(campo)
+        ).values_list('usuario_id', 'categoria_id', 'ano', 'mes').distinct()
+    )
+
+
+def agendar_recalculo(chaves):
+    """
+    Agenda o recálculo dos resumos das chaves para o fim da transação atual
+    (fora de transação, o recálculo é imediato).
+
+    Várias gravações na mesma transação (uma exclusão em cascata, um
+    parcelamento) resultam em um único recálculo com todas as chaves. O
+    cache de relatórios dos usuários afetados é invalidado em seguida.
+    """
+    chaves = {chave for chave in chaves if None not in chave}
+    if not chaves:
+        return
+    if not hasattr(_pendentes, 'chaves'):
+        _pendentes.chaves = set()
+    _pendentes.chaves.update(chaves)
+    transaction.on_commit(_processar_pendentes)
+
+
+def _processar_pendentes():
+    chaves, _pendentes.chaves = _pendentes.chaves, set()
+    if chaves:
+        recalcular_resumos(chaves)
+        # Os relatórios em cache desses usuários passam a ser recalculados
+        invalidar_relatorios({usuario_id for usuario_id, _, _, _ in chaves})
+
+
+def recalcular_resumos(chaves):
+    """Recalcula, a partir das contas e despesas, os resumos das chaves informadas"""
+    por_usuario = defaultdict(set)
+    for usuario_id, categoria_id, ano, mes in chaves:
+        por_usuario[usuario_id].add((categoria_id, ano, mes))
+
+    with transaction.atomic():
+        for usuario_id, itens in por_usuario.items():
+            meses = sorted({(ano, mes) for _, ano, mes in itens})
+            inicio = date(meses[0][0], meses[0][1], 1)
+            fim = adicionar_meses(date(meses[-1][0], meses[-1][1], 1), 1) - timedelta(days=1)
+            categorias = {categoria_id for categoria_id, _, _ in itens}
+            valores = {item: _valores_zerados() for item in itens}
+
+            contas = ContaPagar.objects.filter(
+                usuario_id=usuario_id, categoria_id__in=categorias, data_vencimento__range=(inicio, fim)
+            )
+            for linha in _agregar_contas(contas, ['categoria_id', 'ano', 'mes']):
+                item = (linha['categoria_id'], linha['ano'], linha['mes'])
+                if item in valores:
+                    _somar(valores[item], linha, CAMPOS_CONTAS)
+
+            despesas = DespesaDiaria.objects.filter(
+                usuario_id=usuario_id, categoria_id__in=categorias, data__range=(inicio, fim)
+            )
+            for linha in _agregar_despesas(despesas, ['categoria_id', 'ano', 'mes']):
+                item = (linha['categoria_id'], linha['ano'], linha['mes'])
+                if item in valores:
+                    _somar(valores[item], linha, CAMPOS_DESPESAS)
+
+            _gravar_resumos(usuario_id, valores)
+
+
+def _gravar_resumos(usuario_id, valores):
+    """Grava (upsert) os resumos com movimento e apaga os que ficaram vazios"""
+    vazios = [
+        item for item, dados in valores.items()
+        if not dados['quantidade_contas'] and not dados['quantidade_despesas']
+    ]
+    ResumoMensal.objects.bulk_create(
+        [
+            ResumoMensal(usuario_id=usuario_id, categoria_id=categoria_id, ano=ano, mes=mes, **dados)
+            for (categoria_id, ano, mes), dados in valores.items()
+            if dados['quantidade_contas'] or dados['quantidade_despesas']
+        ],
+        batch_size=TAMANHO_LOTE,
+        update_conflicts=True,
+        unique_fields=['usuario', 'categoria', 'ano', 'mes'],
+        update_fields=CAMPOS_RESUMO
+    )
+
+    for i in range(0, len(vazios), TAMANHO_LOTE):
+        ResumoMensal.objects.filter(usuario_id=usuario_id).filter(reduce(or_, (
+            Q(categoria_id=categoria_id, ano=ano, mes=mes)
+            for categoria_id, ano, mes in vazios[i:i + TAMANHO_LOTE]
+        ))).delete()
+
+
+def calcular_resumos(contas, despesas):
+    """Agrega querysets de contas e despesas em {(usuario_id, categoria_id, ano, mes): valores}"""
+    chave = ['usuario_id', 'categoria_id', 'ano', 'mes']
+    valores = defaultdict(_valores_zerados)
+    for linha in _agregar_contas(contas, chave).iterator(chunk_size=2000):
+        _somar(valores[tuple(linha[campo] for campo in chave)], linha, CAMPOS_CONTAS)
+    for linha in _agregar_despesas(despesas, chave).iterator(chunk_size=2000):
+        _somar(valores[tuple(linha[campo] for campo in chave)], linha, CAMPOS_DESPESAS)
+    return valores
+
+
+def reconstruir_resumos(usuario=None):
+    """Apaga e recalcula todos os resumos (de um usuário ou de todos). Retorna quantos foram gravados"""
+    contas = ContaPagar.objects.all()
+    despesas = DespesaDiaria.objects.all()
+    resumos = ResumoMensal.objects.all()
+    if usuario is not None:
+        contas = contas.filter(usuario=usuario)
+        despesas = despesas.filter(usuario=usuario)
+        resumos = resumos.filter(usuario=usuario)
+
+    valores = calcular_resumos(contas, despesas)
+
+    with transaction.atomic():
+        resumos.delete()
+        ResumoMensal.objects.bulk_create(
+            [
+                ResumoMensal(usuario_id=usuario_id, categoria_id=categoria_id, ano=ano, mes=mes, **dados)
+                for (usuario_id, categoria_id, ano, mes), dados in valores.items()
+            ],
+            batch_size=TAMANHO_LOTE
+        )
+    return len(valores)
+
+
+def filtro_meses(inicio, fim):
+    """Q que seleciona os resumos dos meses entre as datas `inicio` e `fim` (inclusive)"""
+    return (
+        (Q(ano__gt=inicio.year) | Q(ano=inicio.year, mes__gte=inicio.month))
+        & (Q(ano__lt=fim.year) | Q(ano=fim.year, mes__lte=fim.month))
+    )
+
+
+def totais_por_categoria(usuario, inicio, fim, tempos=None):
+    """
+    Totais por categoria entre duas datas quaisquer.
+
+    Os meses inteiros do intervalo vêm do ResumoMensal; só os dias soltos
+    nas pontas (mês inicial e final incompletos) são somados a partir das
+    contas e despesas. As três consultas são independentes e rodam como
+    seções paralelas (ver core.paralelo), com as durações gravadas em
+    `tempos`. Retorna {categoria_id: {nome, cor, campos do resumo}}.
+    """
+    primeiro_mes = inicio if inicio.day == 1 else adicionar_meses(inicio.replace(day=1), 1)
+    ultimo_mes = fim.replace(day=1) if (fim + timedelta(days=1)).day == 1 else adicionar_meses(fim.replace(day=1), -1)
+
+    secoes = {}
+    if primeiro_mes <= ultimo_mes:
+        resumos = ResumoMensal.objects.filter(usuario=usuario).filter(
+            filtro_meses(primeiro_mes, ultimo_mes)
+        ).values('categoria_id', 'categoria__nome', 'categoria__cor').annotate(
+            **{campo: Sum(campo) for campo in CAMPOS_RESUMO}
+        ).order_by()
+        secoes['resumos'] = lambda: (list(resumos), CAMPOS_RESUMO)
+
+        pontas = []
+        if inicio < primeiro_mes:
+            pontas.append((inicio, primeiro_mes - timedelta(days=1)))
+        fim_ultimo_mes = adicionar_meses(ultimo_mes, 1) - timedelta(days=1)
+        if fim > fim_ultimo_mes:
+            pontas.append((fim_ultimo_mes + timedelta(days=1), fim))
+    else:
+        pontas = [(inicio, fim)]
+
+    if pontas:
+        agrupar_por = ['categoria_id', 'categoria__nome', 'categoria__cor']
+        contas = ContaPagar.objects.filter(usuario=usuario).filter(
+            reduce(or_, (Q(data_vencimento__range=ponta) for ponta in pontas))
+        )
+        despesas = DespesaDiaria.objects.filter(usuario=usuario).filter(
+            reduce(or_, (Q(data__range=ponta) for ponta in pontas))
+        )
+        secoes['contas'] = lambda: (list(_agregar_contas(contas, agrupar_por)), CAMPOS_CONTAS)
+        secoes['despesas'] = lambda: (list(_agregar_despesas(despesas, agrupar_por)), CAMPOS_DESPESAS)
+
+    categorias = defaultdict(_valores_zerados)
+    nomes = {}
+    for linhas, campos in executar_secoes(secoes, tempos).values():
+        for linha in linhas:
+            _somar(categorias[linha['categoria_id']], linha, campos)
+            nomes[linha['categoria_id']] = (linha['categoria__nome'], linha['categoria__cor'])
+
+    return {
+        categoria_id: {'nome': nomes[categoria_id][0], 'cor': nomes[categoria_id][1], **valores}
+        for categoria_id, valores in categorias.items()
+    }
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Categoria, ContaPagar, DespesaDiaria
+from .models import Categoria, ContaPagar, DespesaDiaria, TarefaRelatorio
+from .relatorios import RELATORIOS
 from fornecedores.models import Fornecedor
 
 class CategoriaSerializer(serializers.ModelSerializer):
@@ -25,7 +26,7 @@ class ContaPagarSerializer(serializers.ModelSerializer):
     class Meta:
         model = ContaPagar
         fields = '__all__'
-        read_only_fields = ['usuario', 'criado_em', 'atualizado_em']
+        read_only_fields = ['usuario', 'criado_em', 'atualizado_em', 'conta_recorrente']
     
     def create(self, validated_data):
         validated_data['usuario'] = self.context['request'].user
@@ -57,9 +58,32 @@ class DespesaDiariaSerializer(serializers.ModelSerializer):
     class Meta:
         model = DespesaDiaria
         fields = '__all__'
-        read_only_fields = ['usuario', 'criado_em']
+        read_only_fields = ['usuario', 'criado_em', 'atualizado_em']
     
     def create(self, validated_data):
         validated_data['usuario'] = self.context['request'].user
         return super().create(validated_data)
 
+class TarefaRelatorioSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TarefaRelatorio
+        fields = [
+            'id', 'tipo', 'formato', 'parametros', 'status', 'erro',
+            'criado_em', 'iniciado_em', 'concluido_em', 'expira_em'
+        ]
+        read_only_fields = ['status', 'erro', 'criado_em', 'iniciado_em', 'concluido_em', 'expira_em']
+    
+    def validate(self, attrs):
+        # Os parâmetros são conferidos já no envio, com as mesmas regras do endpoint síncrono
+        parametros = attrs.get('parametros', {})
+        if not isinstance(parametros, dict):
+            raise serializers.ValidationError({'parametros': 'Informe os parâmetros como um objeto'})
+        try:
+            RELATORIOS[attrs['tipo']][0](parametros)
+        except ValueError as erro:
+            raise serializers.ValidationError({'parametros': str(erro)})
+        return attrs
+    
+    def create(self, validated_data):
+        validated_data['usuario'] = self.context['request'].user
+        return super().create(validated_data)
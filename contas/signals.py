@@ -0,0 +1,61 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from .cache_relatorios import invalidar_relatorios_de_todos
+from .models import Categoria, ContaPagar, DespesaDiaria, RegistroExclusao
+from .resumos import agendar_recalculo, chave_resumo
+
+CAMPOS_CHAVE_RESUMO = {'usuario_id', 'categoria_id', 'data_vencimento', 'data'}
+
+
+@receiver(post_delete, sender=ContaPagar)
+@receiver(post_delete, sender=DespesaDiaria)
+def registrar_exclusao(sender, instance, **kwargs):
+    """Grava a marca de exclusão consumida pelo endpoint changes/"""
+    RegistroExclusao.objects.create(
+        modelo=sender._meta.model_name,
+        objeto_id=instance.pk,
+        usuario_id=instance.usuario_id
+    )
+
+
+def _chave_atual(instance):
+    """Chave de resumo da instância, ou None se ainda não tem dados suficientes"""
+    if CAMPOS_CHAVE_RESUMO & instance.get_deferred_fields():
+        return None
+    try:
+        return chave_resumo(instance)
+    except AttributeError:
+        # Data ainda não preenchida (ou em texto, antes do full_clean)
+        return None
+
+
+@receiver(post_init, sender=ContaPagar)
+@receiver(post_init, sender=DespesaDiaria)
+def guardar_chave_resumo(sender, instance, **kwargs):
+    """Guarda a chave original para saber qual resumo deixar quando a conta muda de mês/categoria"""
+    instance._chave_resumo_original = _chave_atual(instance)
+
+
+@receiver(post_save, sender=ContaPagar)
+@receiver(post_save, sender=DespesaDiaria)
+def atualizar_resumo_ao_salvar(sender, instance, **kwargs):
+    chave = _chave_atual(instance)
+    agendar_recalculo(
+        c for c in (instance._chave_resumo_original, chave) if c is not None
+    )
+    instance._chave_resumo_original = chave
+
+
+@receiver(post_delete, sender=ContaPagar)
+@receiver(post_delete, sender=DespesaDiaria)
+def atualizar_resumo_ao_excluir(sender, instance, **kwargs):
+    agendar_recalculo(
+        c for c in (instance._chave_resumo_original, _chave_atual(instance)) if c is not None
+    )
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_relatorios_ao_alterar_categoria(sender, instance, **kwargs):
+    """Nome e cor das categorias aparecem em todos os relatórios"""
+    invalidar_relatorios_de_todos()
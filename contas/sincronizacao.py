@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .models import RegistroExclusao
+
+# Janela relida ao fim de cada sincronização, para não perder gravações que
+# ainda estavam em transação quando o cursor foi emitido
+MARGEM_SINCRONIZACAO = timedelta(seconds=5)
+LIMITE_ALTERACOES = 500
+
+
+def codificar_cursor(momento, objeto_id=0):
+    """Cursor no formato '<microssegundos desde epoch>-<id>'"""
+    epoch = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    delta = momento - epoch
+    microssegundos = (delta.days * 86400 + delta.seconds) * 10**6 + delta.microseconds
+    return f'{microssegundos}-{objeto_id}'
+
+
+def decodificar_cursor(cursor):
+    """Converte o cursor de volta em (momento, id). Gera ValueError se for inválido"""
+    microssegundos, objeto_id = cursor.split('-')
+    microssegundos, objeto_id = int(microssegundos), int(objeto_id)
+    if microssegundos < 0 or objeto_id < 0:
+        raise ValueError('Cursor negativo')
+    epoch = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    try:
+        return epoch + timedelta(microseconds=microssegundos), objeto_id
+    except OverflowError:
+        # Momento além do maior datetime possível
+        raise ValueError('Cursor fora do intervalo de datas')
+
+
+class SincronizacaoMixin:
+    """
+    Adiciona a ação `changes/?since=<cursor>` a um ViewSet.
+
+    Retorna os registros criados/alterados depois do cursor (pela coluna
+    `atualizado_em`) e os ids excluídos desde então (pela tabela de
+    `RegistroExclusao`), junto com o cursor para a próxima chamada.
+    Sem `since`, devolve apenas o cursor atual como ponto de partida.
+    """
+    modelo_sincronizacao = None
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        agora = timezone.now()
+        since = request.query_params.get('since')
+
+        if not since:
+            return Response({
+                'alterados': [],
+                'excluidos': [],
+                'cursor': codificar_cursor(agora - MARGEM_SINCRONIZACAO),
+                'mais': False
+            })
+
+        try:
+            momento, ultimo_id = decodificar_cursor(since)
+        except (ValueError, OverflowError):
+            return Response({'error': 'Cursor inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+        alterados = list(
+            self.get_queryset()
+            .filter(Q(atualizado_em__gt=momento) | Q(atualizado_em=momento, id__gt=ultimo_id))
+            .order_by('atualizado_em', 'id')[:LIMITE_ALTERACOES + 1]
+        )
+        mais = len(alterados) > LIMITE_ALTERACOES
+        alterados = alterados[:LIMITE_ALTERACOES]
+
+        excluidos = RegistroExclusao.objects.filter(
+            usuario=request.user,
+            modelo=self.modelo_sincronizacao,
+            excluido_em__gte=momento
+        ).values_list('objeto_id', flat=True)
+
+        if mais:
+            # Continua exatamente a partir do último registro devolvido
+            ultimo = alterados[-1]
+            cursor = codificar_cursor(ultimo.atualizado_em, ultimo.id)
+        else:
+            cursor = codificar_cursor(max(momento, agora - MARGEM_SINCRONIZACAO))
+
+        return Response({
+            'alterados': self.get_serializer(alterados, many=True).data,
+            'excluidos': list(excluidos),
+            'cursor': cursor,
+            'mais': mais
+        })
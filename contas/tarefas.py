@@ -0,0 +1,99 @@
+"""
+Execução das tarefas de relatório (TarefaRelatorio) pelo worker.
+
+A fila é a própria tabela: o worker reserva a pendente mais antiga com um
+UPDATE condicional (status pendente -> processando), o que funciona em
+SQLite e PostgreSQL e permite mais de um worker sem que dois peguem a
+mesma tarefa.
+"""
+import gzip
+import logging
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from core.exportacao import conteudo_csv
+from .models import TarefaRelatorio
+from .relatorios import RELATORIOS, gerar_relatorio
+
+logger = logging.getLogger(__name__)
+
+# Tempo que o arquivo gerado fica disponível para download
+EXPIRACAO = timedelta(seconds=getattr(settings, 'RELATORIOS_TAREFAS_EXPIRACAO', 60 * 60 * 24 * 7))
+# Tarefas processando há mais tempo que isso voltam para a fila (worker interrompido)
+TEMPO_MAXIMO = timedelta(seconds=getattr(settings, 'RELATORIOS_TAREFAS_TEMPO_MAXIMO', 60 * 30))
+
+TIPOS_CONTEUDO = {
+    'json': 'application/json',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def reservar_proxima():
+    """Marca como processando e retorna a tarefa pendente mais antiga (None se a fila estiver vazia)"""
+    pendentes = TarefaRelatorio.objects.filter(status='pendente').order_by('criado_em', 'id')
+    while True:
+        tarefa_id = pendentes.values_list('id', flat=True).first()
+        if tarefa_id is None:
+            return None
+        reservada = TarefaRelatorio.objects.filter(id=tarefa_id, status='pendente').update(
+            status='processando', iniciado_em=timezone.now()
+        )
+        if reservada:
+            return TarefaRelatorio.objects.select_related('usuario').get(id=tarefa_id)
+        # Outro worker reservou antes; tenta a próxima
+
+
+def _conteudo(tarefa, dados):
+    if tarefa.formato == 'csv':
+        cabecalho, linhas = RELATORIOS[tarefa.tipo][2](dados)
+        return conteudo_csv(cabecalho, linhas).encode('utf-8')
+    # Mesmo renderizador das respostas da API: o arquivo tem o formato do endpoint síncrono
+    return JSONRenderer().render(dados)
+
+
+def executar_tarefa(tarefa):
+    """Calcula o relatório, grava o arquivo compactado e registra o resultado na tarefa"""
+    try:
+        dados = gerar_relatorio(tarefa.tipo, tarefa.usuario, tarefa.parametros)
+        conteudo = gzip.compress(_conteudo(tarefa, dados))
+    except Exception as erro:
+        logger.exception('Falha na tarefa de relatório %s', tarefa.pk)
+        tarefa.status = 'erro'
+        tarefa.erro = str(erro)
+        tarefa.concluido_em = timezone.now()
+        tarefa.save(update_fields=['status', 'erro', 'concluido_em'])
+        return tarefa
+
+    # Nome imprevisível: o arquivo fica em MEDIA_ROOT
+    nome = f'{tarefa.tipo}-{uuid.uuid4().hex}.{tarefa.formato}.gz'
+    tarefa.arquivo.save(nome, ContentFile(conteudo), save=False)
+    tarefa.status = 'concluido'
+    tarefa.concluido_em = timezone.now()
+    tarefa.expira_em = tarefa.concluido_em + EXPIRACAO
+    tarefa.save(update_fields=['arquivo', 'status', 'concluido_em', 'expira_em'])
+    return tarefa
+
+
+def liberar_travadas():
+    """Devolve à fila as tarefas cujo worker parou no meio. Retorna quantas foram liberadas"""
+    return TarefaRelatorio.objects.filter(
+        status='processando', iniciado_em__lt=timezone.now() - TEMPO_MAXIMO
+    ).update(status='pendente', iniciado_em=None)
+
+
+def apagar_arquivo(tarefa):
+    if tarefa.arquivo:
+        tarefa.arquivo.delete(save=False)
+
+
+def expirar_tarefas():
+    """Apaga os arquivos das tarefas vencidas e as marca como expiradas. Retorna quantas expiraram"""
+    vencidas = list(TarefaRelatorio.objects.filter(status='concluido', expira_em__lte=timezone.now()))
+    for tarefa in vencidas:
+        apagar_arquivo(tarefa)
+        tarefa.status = 'expirado'
+    TarefaRelatorio.objects.bulk_update(vencidas, ['arquivo', 'status'])
+    return len(vencidas)
@@ -0,0 +1,153 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+from contas.importacao import ImportadorCSV
+from contas.models import Categoria, ContaPagar, DespesaDiaria, ResumoMensal
+
+INDICES_CONTAS_PENDENTES = ('conta_usuario_status_venc_idx', 'conta_pendente_venc_idx')
+INDICE_DESPESAS_PERIODO = 'despesa_usuario_data_idx'
+
+
+class PlanosConsultasTest(TestCase):
+    """
+    As consultas de vencidas/, hoje/ e despesas/resumo_mensal/ usam os
+    índices da migração 0005_indices_consultas (os mesmos filtros das views).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('usuario', password='senha')
+        cls.hoje = date(2024, 5, 15)
+
+    def _vencidas(self):
+        return ContaPagar.objects.filter(usuario=self.usuario, status='pendente', data_vencimento__lt=self.hoje)
+
+    def _hoje(self):
+        return ContaPagar.objects.filter(usuario=self.usuario, status='pendente', data_vencimento=self.hoje)
+
+    def _resumo_mensal(self):
+        inicio = self.hoje.replace(day=1)
+        return DespesaDiaria.objects.filter(usuario=self.usuario, data__range=(inicio, self.hoje)).order_by()
+
+    def _plano(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Com as tabelas vazias do teste o PostgreSQL sempre prefere a leitura sequencial
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertUsaIndice(self, queryset, indices):
+        plano = self._plano(queryset)
+        self.assertTrue(any(indice in plano for indice in indices), plano)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Planos do SQLite')
+    def test_sqlite(self):
+        self.assertUsaIndice(self._vencidas(), INDICES_CONTAS_PENDENTES)
+        self.assertUsaIndice(self._hoje(), INDICES_CONTAS_PENDENTES)
+        self.assertUsaIndice(self._resumo_mensal(), [INDICE_DESPESAS_PERIODO])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Planos do PostgreSQL')
+    def test_postgresql(self):
+        self.assertUsaIndice(self._vencidas(), INDICES_CONTAS_PENDENTES)
+        self.assertUsaIndice(self._hoje(), INDICES_CONTAS_PENDENTES)
+        self.assertUsaIndice(self._resumo_mensal(), [INDICE_DESPESAS_PERIODO])
+
+
+
+class AlteracaoRecorrenciaTest(TestCase):
+    """Alterar uma conta recorrente só avança a próxima geração: nada é gerado de novo"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('usuario', password='senha')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        categoria = Categoria.objects.create(nome='Aluguel')
+        response = self.client.post('/api/contas/contas-pagar/', {
+            'descricao': 'Aluguel',
+            'valor': '1000.00',
+            'data_vencimento': '2024-01-10',
+            'categoria_id': categoria.id,
+            'eh_recorrente': True,
+            'tipo_recorrencia': 'mensal',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.conta = ContaPagar.objects.get(pk=response.json()['id'])
+        self.assertEqual(self.conta.proxima_geracao, date(2024, 2, 10))
+
+        call_command('gerar_contas_recorrentes', data='2024-06-20', stdout=StringIO())
+        self.conta.refresh_from_db()
+        self.assertEqual(self.conta.proxima_geracao, date(2024, 7, 10))
+        self.total = ContaPagar.objects.count()
+
+    def _alterar(self, **dados):
+        response = self.client.patch(f'/api/contas/contas-pagar/{self.conta.pk}/', dados, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.conta.refresh_from_db()
+
+    def test_mudar_vencimento_nao_volta_a_serie(self):
+        self._alterar(data_vencimento='2024-01-15')
+        self.assertEqual(self.conta.proxima_geracao, date(2024, 7, 15))
+
+        call_command('gerar_contas_recorrentes', data='2024-06-20', stdout=StringIO())
+        self.assertEqual(ContaPagar.objects.count(), self.total)
+
+    def test_mudar_fim_mantem_a_proxima_geracao(self):
+        self._alterar(data_fim_recorrencia='2025-12-31')
+        self.assertEqual(self.conta.proxima_geracao, date(2024, 7, 10))
+
+        # Ocorrência excluída pelo usuário não volta
+        ContaPagar.objects.filter(conta_recorrente=self.conta, data_vencimento=date(2024, 3, 10)).delete()
+        call_command('gerar_contas_recorrentes', data='2024-06-20', stdout=StringIO())
+        self.assertEqual(ContaPagar.objects.count(), self.total - 1)
+
+
+class ImportacaoCSVTest(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('usuario', password='senha')
+        Categoria.objects.create(nome='Luz')
+
+    def _importar(self, conteudo):
+        return ImportadorCSV('contas', self.usuario).importar(StringIO(conteudo))
+
+    def test_linha_do_erro_com_campo_em_varias_linhas(self):
+        relatorio = self._importar(
+            'descricao;valor;vencimento;categoria;observacoes\n'
+            'Conta;10,00;10/01/2024;Luz;"primeira\nsegunda"\n'
+            'Outra;abc;10/01/2024;Luz;\n'
+        )
+        self.assertEqual(relatorio['importados'], 1)
+        self.assertEqual(relatorio['erros'], [{'linha': 4, 'erros': ["Valor inválido: 'abc'"]}])
+        self.assertEqual(ContaPagar.objects.get().observacoes, 'primeira\nsegunda')
+
+    def test_resumo_recalculado_no_fim(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._importar(
+                'descricao;valor;vencimento;categoria\n'
+                'A;10,00;10/01/2024;Luz\n'
+                'B;5,50;20/01/2024;Luz\n'
+            )
+        resumo = ResumoMensal.objects.get(usuario=self.usuario, ano=2024, mes=1)
+        self.assertEqual(resumo.quantidade_contas, 2)
+        self.assertEqual(resumo.total_contas, Decimal('15.50'))
+
+
+class CacheRelatoriosTest(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('usuario', password='senha'))
+
+    def test_server_timing_no_hit_e_no_miss(self):
+        primeira = self.client.get('/api/contas/relatorios/mensal/')
+        segunda = self.client.get('/api/contas/relatorios/mensal/')
+        self.assertEqual((primeira['X-Cache'], segunda['X-Cache']), ('MISS', 'HIT'))
+        self.assertTrue(primeira['Server-Timing'].startswith('cache;desc=miss, '))
+        self.assertIn('total;dur=', primeira['Server-Timing'])
+        self.assertRegex(segunda['Server-Timing'], r'^cache;desc=hit;dur=\d+\.\d$')
@@ -0,0 +1,79 @@
+from calendar import monthrange
+from datetime import timedelta
+from decimal import Decimal, ROUND_DOWN
+
+# Passo de cada tipo de recorrência, em meses ou em dias
+MESES_RECORRENCIA = {'mensal': 1, 'bimestral': 2, 'trimestral': 3, 'semestral': 6, 'anual': 12}
+DIAS_RECORRENCIA = {'semanal': 7, 'quinzenal': 15}
+
+
+def adicionar_meses(data, meses):
+    """Adiciona meses a uma data, usando o último dia do mês quando o dia não existe (ex: 31/02)"""
+    total_meses = data.month - 1 + meses
+    ano = data.year + total_meses // 12
+    mes = total_meses % 12 + 1
+    dia = min(data.day, monthrange(ano, mes)[1])
+    return data.replace(year=ano, month=mes, day=dia)
+
+
+def calcular_parcelas(valor_total, numero_parcelas, primeiro_vencimento):
+    """
+    Calcula o cronograma de um parcelamento mensal.
+
+    Todas as parcelas recebem o valor arredondado para baixo em centavos e a
+    diferença do arredondamento vai para a última parcela, de modo que a soma
+    seja sempre igual ao valor total. Os vencimentos avançam mês a mês a partir
+    do primeiro vencimento.
+    """
+    valor_total = Decimal(valor_total)
+    valor_parcela = (valor_total / numero_parcelas).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+    valor_ultima = valor_total - valor_parcela * (numero_parcelas - 1)
+
+    return [
+        {
+            'parcela_atual': i,
+            'valor': valor_ultima if i == numero_parcelas else valor_parcela,
+            'data_vencimento': adicionar_meses(primeiro_vencimento, i - 1),
+        }
+        for i in range(1, numero_parcelas + 1)
+    ]
+
+
+def datas_recorrencia(inicio, tipo_recorrencia, a_partir_de=None):
+    """
+    Itera, sem fim, as datas de uma série recorrente cujo primeiro vencimento
+    é `inicio` (que não é incluído), começando pela primeira data >= `a_partir_de`.
+
+    Cada data é calculada a partir de `inicio`, e não da data anterior, para
+    que um vencimento no dia 31 não "escorregue" para o dia 28 depois de
+    fevereiro.
+    """
+    if tipo_recorrencia in MESES_RECORRENCIA:
+        passo = MESES_RECORRENCIA[tipo_recorrencia]
+        calcular = lambda n: adicionar_meses(inicio, n * passo)
+        distancia = ((a_partir_de.year - inicio.year) * 12 + a_partir_de.month - inicio.month) if a_partir_de else 0
+    elif tipo_recorrencia in DIAS_RECORRENCIA:
+        passo = DIAS_RECORRENCIA[tipo_recorrencia]
+        calcular = lambda n: inicio + timedelta(days=n * passo)
+        distancia = (a_partir_de - inicio).days if a_partir_de else 0
+    else:
+        raise ValueError(f'Tipo de recorrência inválido: {tipo_recorrencia!r}')
+
+    # Estimativa que nunca passa da primeira ocorrência desejada
+    n = max(1, distancia // passo)
+    while True:
+        data = calcular(n)
+        n += 1
+        if a_partir_de is None or data >= a_partir_de:
+            yield data
+
+
+def primeira_recorrencia(inicio, tipo_recorrencia, data_fim=None, a_partir_de=None):
+    """
+    Data da primeira ocorrência gerada de uma série (a primeira >= `a_partir_de`,
+    se informado), ou None se a série já terminou
+    """
+    data = next(datas_recorrencia(inicio, tipo_recorrencia, a_partir_de))
+    if data_fim and data > data_fim:
+        return None
+    return data
@@ -1,68 +1,258 @@
-from rest_framework import viewsets, status
+import codecs
+import gzip
+import time
+from rest_framework import serializers, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Sum, Count
+from django.db.models import F, Q, Sum, Count, Avg, Min, Max
+from django.db.models.functions import Coalesce
+from django.db import transaction
+from django.http import FileResponse
 from django.utils import timezone
 from datetime import datetime, timedelta
-from .models import Categoria, ContaPagar, DespesaDiaria
-from .serializers import CategoriaSerializer, ContaPagarSerializer, DespesaDiariaSerializer
+from decimal import Decimal, InvalidOperation
+from fornecedores.models import Fornecedor
+from .models import Categoria, ContaPagar, DespesaDiaria, TarefaRelatorio
+from .serializers import CategoriaSerializer, ContaPagarSerializer, DespesaDiariaSerializer, TarefaRelatorioSerializer
+from .cache_relatorios import cache_relatorio
+from .importacao import ImportadorCSV
+from .projecao import GRANULARIDADES, inicio_periodo, proximo_periodo
+from .relatorios import gerar_relatorio, ler_parametros_mensal
+from .resumos import agendar_recalculo, chave_resumo, chaves_do_queryset
+from .sincronizacao import SincronizacaoMixin
+from .tarefas import TIPOS_CONTEUDO, apagar_arquivo
+from .utils import calcular_parcelas, primeira_recorrencia
+from core.exportacao import resposta_csv
+from core.mixins import ETagListMixin
+from core.paralelo import cabecalho_server_timing
+from core.pagination import PaginacaoCursor, PaginacaoDetalhes
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+CENTAVO = Decimal('0.01')
+
+def _centavos(valor):
+    """Arredonda médias (Avg) para centavos; None continua None"""
+    return None if valor is None else Decimal(valor).quantize(CENTAVO)
+
+def _importar_csv(request, tipo):
+    """Importa o CSV enviado no campo `arquivo` e retorna o relatório por linha"""
+    arquivo = request.FILES.get('arquivo')
+    if not arquivo:
+        return Response({'error': 'Envie o arquivo CSV no campo "arquivo"'}, status=status.HTTP_400_BAD_REQUEST)
+
+    simular = str(request.data.get('simular', '')).lower() in ('1', 'true', 'on', 'sim')
+    importador = ImportadorCSV(tipo, request.user, simular=simular)
+
+    try:
+        relatorio = importador.importar(codecs.iterdecode(arquivo, 'utf-8-sig'))
+    except UnicodeDecodeError:
+        return Response({'error': 'O arquivo deve estar codificado em UTF-8'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(relatorio)
+
+class CategoriaViewSet(ETagListMixin, viewsets.ModelViewSet):
     serializer_class = CategoriaSerializer
     permission_classes = []  # Permitir acesso público
     
     def get_queryset(self):
         return Categoria.objects.filter(ativo=True)
 
-class ContaPagarViewSet(viewsets.ModelViewSet):
+class ContaPagarViewSet(ETagListMixin, SincronizacaoMixin, viewsets.ModelViewSet):
     serializer_class = ContaPagarSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoCursor
+    ordenacao_cursor = ('data_vencimento', 'id')
+    modelo_sincronizacao = 'contapagar'
     
     def get_queryset(self):
         return ContaPagar.objects.filter(usuario=self.request.user)
     
+    def get_querysets_versao(self):
+        # A listagem também serializa a categoria e o fornecedor de cada conta
+        contas = self.filter_queryset(self.get_queryset())
+        return [
+            contas,
+            Categoria.objects.filter(id__in=contas.values('categoria_id')),
+            Fornecedor.objects.filter(id__in=contas.values('fornecedor_id')),
+        ]
+    
     def perform_create(self, serializer):
-        conta = serializer.save(usuario=self.request.user)
-        
-        # Se é parcelado, criar as outras parcelas
-        if conta.eh_parcelado and conta.numero_parcelas > 1:
-            self._criar_parcelas(conta)
+        dados = serializer.validated_data
+        
+        # Se é parcelado, a primeira parcela e as demais são criadas juntas
+        if dados.get('eh_parcelado') and dados.get('numero_parcelas', 1) > 1:
+            with transaction.atomic():
+                parcelas = calcular_parcelas(dados['valor'], dados['numero_parcelas'], dados['data_vencimento'])
+                primeira = parcelas[0]
+                conta = serializer.save(
+                    usuario=self.request.user,
+                    valor=primeira['valor'],
+                    valor_parcela=primeira['valor'],
+                    parcela_atual=1
+                )
+                self._criar_parcelas(conta, parcelas[1:])
+        else:
+            serializer.save(usuario=self.request.user, **self._dados_recorrencia(serializer))
+    
+    def perform_update(self, serializer):
+        serializer.save(**self._dados_recorrencia(serializer))
+    
+    def _dados_recorrencia(self, serializer):
+        """
+        Recalcula a próxima geração quando a recorrência é criada ou alterada.
+
+        Na criação a série começa depois do vencimento. Numa alteração ela só
+        avança: a próxima geração é a primeira data da série (já com os novos
+        dados) a partir da próxima geração atual, ou de hoje se a série não
+        tinha uma; senão ocorrências já geradas ou excluídas voltariam.
+        """
+        dados = serializer.validated_data
+        campos = ('eh_recorrente', 'tipo_recorrencia', 'data_vencimento', 'data_fim_recorrencia')
+        atual = {campo: getattr(serializer.instance, campo, None) for campo in campos}
+        novo = {**atual, **{campo: dados[campo] for campo in campos if campo in dados}}
+        
+        if dados.get('proxima_geracao') or (serializer.instance and novo == atual):
+            return {}
+        if not novo['eh_recorrente'] or not novo['tipo_recorrencia']:
+            return {'proxima_geracao': None}
+        a_partir_de = None
+        if serializer.instance:
+            a_partir_de = serializer.instance.proxima_geracao or timezone.localdate()
+        return {'proxima_geracao': primeira_recorrencia(
+            novo['data_vencimento'], novo['tipo_recorrencia'], novo['data_fim_recorrencia'], a_partir_de
+        )}
     
-    def _criar_parcelas(self, conta_principal):
-        """Cria as parcelas adicionais para uma conta parcelada"""
-        from datetime import timedelta
-        from decimal import Decimal
-        
-        # Calcular valor da parcela (dividir o valor total pelo número de parcelas)
-        valor_parcela = conta_principal.valor / conta_principal.numero_parcelas
-        
-        # Atualizar a primeira parcela (que já foi criada) com o valor correto
-        conta_principal.valor = valor_parcela
-        conta_principal.valor_parcela = valor_parcela
-        conta_principal.save()
-        
-        # Criar as parcelas adicionais (a partir da segunda)
-        for i in range(2, conta_principal.numero_parcelas + 1):
-            # Calcular data de vencimento da parcela (30 dias após a anterior)
-            # Usar a data de vencimento da primeira parcela como base
-            data_vencimento = conta_principal.data_vencimento + timedelta(days=30 * (i - 1))
-            
-            ContaPagar.objects.create(
+    def _criar_parcelas(self, conta_principal, parcelas):
+        """Cria as parcelas adicionais de uma conta parcelada em um único INSERT"""
+        criadas = ContaPagar.objects.bulk_create([
+            ContaPagar(
                 descricao=conta_principal.descricao,
-                valor=valor_parcela,
-                data_vencimento=data_vencimento,
+                valor=parcela['valor'],
+                data_vencimento=parcela['data_vencimento'],
                 status='pendente',
                 categoria=conta_principal.categoria,
+                fornecedor=conta_principal.fornecedor,
                 observacoes=conta_principal.observacoes,
                 usuario=conta_principal.usuario,
                 eh_parcelado=True,
                 numero_parcelas=conta_principal.numero_parcelas,
-                parcela_atual=i,
-                valor_parcela=valor_parcela,
+                parcela_atual=parcela['parcela_atual'],
+                valor_parcela=parcela['valor'],
                 conta_principal=conta_principal
             )
+            for parcela in parcelas
+        ])
+        # bulk_create não dispara os sinais que mantêm o ResumoMensal
+        agendar_recalculo(chave_resumo(parcela) for parcela in criadas)
     
+    @action(detail=False, methods=['get'])
+    def simular_parcelas(self, request):
+        """Calcula o cronograma de um parcelamento sem gravar nada"""
+        try:
+            valor = Decimal(request.query_params.get('valor', ''))
+            numero_parcelas = int(request.query_params.get('numero_parcelas', ''))
+            data_vencimento = datetime.strptime(request.query_params.get('data_vencimento', ''), '%Y-%m-%d').date()
+        except (InvalidOperation, ValueError):
+            return Response(
+                {'error': 'Informe valor, numero_parcelas e data_vencimento (AAAA-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not valor.is_finite() or valor <= 0 or not 1 <= numero_parcelas <= 360:
+            return Response(
+                {'error': 'O valor deve ser positivo e o número de parcelas entre 1 e 360'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        parcelas = calcular_parcelas(valor, numero_parcelas, data_vencimento)
+        
+        return Response({
+            'valor_total': valor,
+            'numero_parcelas': numero_parcelas,
+            'parcelas': parcelas
+        })
+    
+    def _filtros_cards(self):
+        """Condições de cada card de vencimento (vencidas, hoje, amanhã...)"""
+        hoje = timezone.now().date()
+        amanha = hoje + timedelta(days=1)
+
+        pendente = Q(status='pendente')
+        return {
+            'vencidas': pendente & Q(data_vencimento__lt=hoje),
+            'hoje': pendente & Q(data_vencimento=hoje),
+            'amanha': pendente & Q(data_vencimento=amanha),
+            'pendentes': pendente,
+            'recorrentes': Q(eh_recorrente=True),
+        }
+
+    def _filtrar_contas(self, queryset, status_padrao='pendente'):
+        """
+        Aplica os filtros de status, categoria, período e busca enviados pela
+        listagem. Gera ValueError se a categoria ou as datas forem inválidas.
+        """
+        status_param = self.request.query_params.get('status')
+        categoria = self.request.query_params.get('categoria')
+        data_inicial = self.request.query_params.get('data_inicial')
+        data_final = self.request.query_params.get('data_final')
+        search = self.request.query_params.get('search')
+
+        try:
+            categoria = int(categoria) if categoria else None
+            data_inicial = datetime.strptime(data_inicial, '%Y-%m-%d').date() if data_inicial else None
+            data_final = datetime.strptime(data_final, '%Y-%m-%d').date() if data_final else None
+        except ValueError:
+            raise ValueError('categoria deve ser um número e as datas no formato AAAA-MM-DD')
+
+        filtros_cards = self._filtros_cards()
+        if status_param in filtros_cards:
+            queryset = queryset.filter(filtros_cards[status_param])
+        elif status_param:
+            queryset = queryset.filter(status=status_param)
+        elif status_padrao:
+            queryset = queryset.filter(status=status_padrao)
+
+        if categoria:
+            queryset = queryset.filter(categoria_id=categoria)
+
+        if data_inicial:
+            queryset = queryset.filter(data_vencimento__gte=data_inicial)
+
+        if data_final:
+            queryset = queryset.filter(data_vencimento__lte=data_final)
+
+        if search:
+            queryset = queryset.filter(
+                Q(descricao__icontains=search) |
+                Q(observacoes__icontains=search) |
+                Q(fornecedor__nome__icontains=search)
+            )
+
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def resumo(self, request):
+        """Retorna totais e quantidades de todos os cards em uma única consulta"""
+        filtros = self._filtros_cards()
+
+        agregados = {}
+        for nome, filtro in filtros.items():
+            agregados[f'{nome}_total'] = Sum('valor', filter=filtro)
+            agregados[f'{nome}_quantidade'] = Count('id', filter=filtro)
+
+        dados = self.get_queryset().aggregate(**agregados)
+
+        resultado = {
+            nome: {
+                'total': dados[f'{nome}_total'] or 0,
+                'quantidade': dados[f'{nome}_quantidade']
+            }
+            for nome in filtros
+        }
+        resultado['data'] = timezone.now().date()
+
+        return Response(resultado)
+
     @action(detail=False, methods=['get'])
     def pendentes(self, request):
         """Retorna todas as contas pendentes"""
@@ -144,57 +334,61 @@ class ContaPagarViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def por_fornecedor(self, request):
-        """Retorna contas agrupadas por fornecedor"""
-        contas = self.get_queryset().filter(status='pendente')
-        
-        # Agrupar por descrição (fornecedor)
-        fornecedores = {}
-        for conta in contas:
-            fornecedor = conta.descricao
-            if fornecedor not in fornecedores:
-                fornecedores[fornecedor] = {
-                    'fornecedor': fornecedor,
-                    'total_valor': 0,
-                    'total_parcelas': 0,
-                    'parcelas_pagas': 0,
-                    'parcelas_pendentes': 0,
-                    'primeiro_vencimento': None,
-                    'ultimo_vencimento': None,
-                    'categoria': conta.categoria.nome,
-                    'categoria_cor': conta.categoria.cor,
-                    'contas': []
-                }
-            
-            fornecedores[fornecedor]['total_valor'] += float(conta.valor)
-            fornecedores[fornecedor]['total_parcelas'] += 1
-            
-            if conta.status == 'pago':
-                fornecedores[fornecedor]['parcelas_pagas'] += 1
-            else:
-                fornecedores[fornecedor]['parcelas_pendentes'] += 1
-            
-            if not fornecedores[fornecedor]['primeiro_vencimento'] or conta.data_vencimento < fornecedores[fornecedor]['primeiro_vencimento']:
-                fornecedores[fornecedor]['primeiro_vencimento'] = conta.data_vencimento
-            
-            if not fornecedores[fornecedor]['ultimo_vencimento'] or conta.data_vencimento > fornecedores[fornecedor]['ultimo_vencimento']:
-                fornecedores[fornecedor]['ultimo_vencimento'] = conta.data_vencimento
-            
-            fornecedores[fornecedor]['contas'].append({
-                'id': conta.id,
-                'valor': conta.valor,
-                'data_vencimento': conta.data_vencimento,
-                'status': conta.status,
-                'eh_parcelado': conta.eh_parcelado,
-                'parcela_atual': conta.parcela_atual,
-                'numero_parcelas': conta.numero_parcelas
-            })
-        
-        # Ordenar por total de valor (maior primeiro)
-        resultado = list(fornecedores.values())
-        resultado.sort(key=lambda x: x['total_valor'], reverse=True)
-        
+        """Retorna contas agrupadas por fornecedor (ou descrição, quando não há fornecedor)"""
+        try:
+            contas = self._filtrar_contas(self.get_queryset())
+        except ValueError as erro:
+            return Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+
+        grupos = contas.annotate(
+            chave=Coalesce('fornecedor__nome', 'descricao')
+        ).values('fornecedor_id', 'chave').annotate(
+            total_valor=Sum('valor'),
+            total_parcelas=Count('id'),
+            parcelas_pagas=Count('id', filter=Q(status='pago')),
+            parcelas_pendentes=Count('id', filter=~Q(status='pago')),
+            primeiro_vencimento=Min('data_vencimento'),
+            ultimo_vencimento=Max('data_vencimento'),
+        ).order_by('-total_valor', 'chave')
+
+        # Um fornecedor pode ter contas de várias categorias: o grupo não leva categoria
+        resultado = []
+        for grupo in grupos:
+            grupo['fornecedor'] = grupo['chave']
+            resultado.append(grupo)
+
         return Response(resultado)
-    
+
+    @action(detail=False, methods=['get'], url_path='por_fornecedor/contas')
+    def por_fornecedor_contas(self, request):
+        """Retorna, paginadas, as contas de um grupo de por_fornecedor"""
+        fornecedor_id = request.query_params.get('fornecedor_id')
+        try:
+            contas = self._filtrar_contas(self.get_queryset())
+            fornecedor_id = int(fornecedor_id) if fornecedor_id else None
+        except ValueError:
+            return Response(
+                {'error': 'fornecedor_id e categoria devem ser números e as datas no formato AAAA-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if fornecedor_id:
+            contas = contas.filter(fornecedor_id=fornecedor_id)
+        else:
+            contas = contas.filter(
+                fornecedor__isnull=True,
+                descricao=request.query_params.get('chave', '')
+            )
+
+        contas = contas.order_by('data_vencimento', 'id').values(
+            'id', 'descricao', 'valor', 'data_vencimento', 'status',
+            'eh_parcelado', 'parcela_atual', 'numero_parcelas'
+        )
+
+        paginador = PaginacaoDetalhes()
+        pagina = paginador.paginate_queryset(contas, request, view=self)
+        return paginador.get_paginated_response(pagina)
+
     @action(detail=False, methods=['get'])
     def recorrentes(self, request):
         """Retorna todas as contas recorrentes"""
@@ -221,9 +415,122 @@ class ContaPagarViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(conta)
         return Response(serializer.data)
 
-class DespesaDiariaViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """Exporta as contas filtradas em CSV (streaming)"""
+        try:
+            contas = self._filtrar_contas(self.get_queryset(), status_padrao=None).order_by('data_vencimento', 'id')
+        except ValueError as erro:
+            return Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return resposta_csv('contas_a_pagar.csv', [
+            ('ID', 'id'),
+            ('Descrição', 'descricao'),
+            ('Valor', 'valor'),
+            ('Vencimento', 'data_vencimento'),
+            ('Status', 'status'),
+            ('Categoria', 'categoria__nome'),
+            ('Fornecedor', 'fornecedor__nome'),
+            ('Parcela', 'parcela_atual'),
+            ('Total de Parcelas', 'numero_parcelas'),
+            ('Data de Pagamento', 'data_pagamento'),
+            ('Valor Pago', 'valor_pago'),
+            ('Observações', 'observacoes'),
+        ], contas)
+
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """Importa contas de um arquivo CSV"""
+        return _importar_csv(request, 'contas')
+
+    @action(detail=False, methods=['post'])
+    def marcar_pago_lote(self, request):
+        """
+        Marca várias contas como pagas com um único UPDATE.
+
+        Aceita uma lista de `ids` e/ou os filtros `fornecedor_id`, `categoria`
+        e `vencimento_ate`. Só contas pendentes ou vencidas são afetadas.
+        """
+        ids = request.data.get('ids')
+        fornecedor_id = request.data.get('fornecedor_id')
+        categoria = request.data.get('categoria')
+        vencimento_ate = request.data.get('vencimento_ate')
+        data_pagamento = request.data.get('data_pagamento')
+        registrar_valor_pago = request.data.get('registrar_valor_pago')
+
+        # bool("false") seria True: usa a mesma conversão dos serializers (true/false, 1/0, ...)
+        try:
+            registrar_valor_pago = serializers.BooleanField().to_internal_value(registrar_valor_pago or False)
+        except serializers.ValidationError:
+            return Response(
+                {'error': 'registrar_valor_pago deve ser true ou false'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if ids is None and not any([fornecedor_id, categoria, vencimento_ate]):
+            return Response(
+                {'error': 'Informe ids ou ao menos um filtro (fornecedor_id, categoria, vencimento_ate)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Uma string como "12" seria percorrida caractere a caractere (ids 1 e 2)
+        if ids is not None and not (
+            isinstance(ids, list) and ids
+            and all(isinstance(conta_id, int) and not isinstance(conta_id, bool) for conta_id in ids)
+        ):
+            return Response(
+                {'error': 'ids deve ser uma lista não vazia de números inteiros'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        contas = self.get_queryset().filter(status__in=['pendente', 'vencido'])
+
+        try:
+            if ids:
+                contas = contas.filter(id__in=ids)
+            if fornecedor_id:
+                contas = contas.filter(fornecedor_id=int(fornecedor_id))
+            if categoria:
+                contas = contas.filter(categoria_id=int(categoria))
+            if vencimento_ate:
+                contas = contas.filter(data_vencimento__lte=datetime.strptime(vencimento_ate, '%Y-%m-%d').date())
+            # strptime gera TypeError para o que não for texto (ex.: um número)
+            if data_pagamento in (None, ''):
+                data_pagamento = timezone.localdate()
+            else:
+                data_pagamento = datetime.strptime(data_pagamento, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'Parâmetros inválidos: ids e filtros devem ser números e datas no formato AAAA-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        campos = {
+            'status': 'pago',
+            'data_pagamento': data_pagamento,
+            'atualizado_em': timezone.now(),
+        }
+        if registrar_valor_pago:
+            campos['valor_pago'] = F('valor')
+
+        with transaction.atomic():
+            total = contas.aggregate(total=Sum('valor'))['total'] or 0
+            # update() não dispara sinais: os resumos afetados são recalculados no commit
+            agendar_recalculo(chaves_do_queryset(contas))
+            quantidade = contas.update(**campos)
+
+        return Response({
+            'quantidade': quantidade,
+            'total': total,
+            'data_pagamento': data_pagamento
+        })
+
+class DespesaDiariaViewSet(ETagListMixin, SincronizacaoMixin, viewsets.ModelViewSet):
     serializer_class = DespesaDiariaSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoCursor
+    ordenacao_cursor = ('-data', 'id')
+    modelo_sincronizacao = 'despesadiaria'
     
     def get_queryset(self):
         queryset = DespesaDiaria.objects.filter(usuario=self.request.user)
@@ -234,6 +541,16 @@ class DespesaDiariaViewSet(viewsets.ModelViewSet):
         categoria = self.request.query_params.get('categoria')
         search = self.request.query_params.get('search')
         
+        # Usado por todas as ações (listagem, exportar, por_categoria...): filtro inválido é 400 em qualquer uma
+        try:
+            categoria = int(categoria) if categoria else None
+            data_inicial = datetime.strptime(data_inicial, '%Y-%m-%d').date() if data_inicial else None
+            data_final = datetime.strptime(data_final, '%Y-%m-%d').date() if data_final else None
+        except ValueError:
+            raise serializers.ValidationError(
+                {'error': 'categoria deve ser um número e as datas no formato AAAA-MM-DD'}
+            )
+        
         if data_inicial:
             queryset = queryset.filter(data__gte=data_inicial)
         
@@ -251,305 +568,280 @@ class DespesaDiariaViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('-data')
     
+    def get_querysets_versao(self):
+        # A listagem também serializa a categoria de cada despesa
+        despesas = self.filter_queryset(self.get_queryset())
+        return [despesas, Categoria.objects.filter(id__in=despesas.values('categoria_id'))]
+    
     def perform_create(self, serializer):
         serializer.save(usuario=self.request.user)
     
     @action(detail=False, methods=['get'])
-    def resumo_mensal(self, request):
-        """Retorna resumo de despesas do período"""
-        data_inicial = request.query_params.get('data_inicial')
+    def exportar(self, request):
+        """Exporta as despesas filtradas em CSV (streaming)"""
+        despesas = self.get_queryset().order_by('-data', 'id')
+
+        return resposta_csv('despesas.csv', [
+            ('ID', 'id'),
+            ('Descrição', 'descricao'),
+            ('Valor', 'valor'),
+            ('Data', 'data'),
+            ('Categoria', 'categoria__nome'),
+            ('Observações', 'observacoes'),
+        ], despesas)
+
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """Importa despesas de um arquivo CSV"""
+        return _importar_csv(request, 'despesas')
+
+    def _periodo_resumo(self, request):
+        """
+        Lê data_inicial/data_final. Sem data_final, vai até hoje; sem
+        data_inicial, começa no primeiro dia do mês de data_final (sem
+        nenhuma das duas: mês atual até hoje). Gera ValueError se inválidas.
+        """
         data_final = request.query_params.get('data_final')
+        data_final = datetime.strptime(data_final, '%Y-%m-%d').date() if data_final else timezone.localdate()
+        data_inicial = request.query_params.get('data_inicial')
+        data_inicial = datetime.strptime(data_inicial, '%Y-%m-%d').date() if data_inicial else data_final.replace(day=1)
+        return data_inicial, data_final
+
+    @action(detail=False, methods=['get'])
+    def resumo_mensal(self, request):
+        """
+        Resumo de despesas do período: total, quantidade, médias, menor e
+        maior despesa. Com granularidade=dia|semana|mes, inclui a série
+        para os gráficos (períodos sem despesas entram zerados).
+        """
+        try:
+            data_inicial, data_final = self._periodo_resumo(request)
+        except ValueError:
+            return Response(
+                {'error': 'Use datas no formato AAAA-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if data_inicial > data_final:
+            return Response(
+                {'error': 'data_inicial deve ser anterior a data_final'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        queryset = self.get_queryset()
-        
-        # Se não especificou datas, usar mês atual
-        if not data_inicial and not data_final:
-            hoje = timezone.now().date()
-            inicio_mes = hoje.replace(day=1)
-            queryset = queryset.filter(
-                data__gte=inicio_mes,
-                data__lte=hoje
+        granularidade = request.query_params.get('granularidade')
+        if granularidade and granularidade not in GRANULARIDADES:
+            return Response(
+                {'error': 'Use granularidade dia, semana ou mes'},
+                status=status.HTTP_400_BAD_REQUEST
             )
         
-        total = queryset.aggregate(total=Sum('valor'))['total'] or 0
-        quantidade = queryset.count()
+        queryset = self.get_queryset().filter(data__range=(data_inicial, data_final)).order_by()
         
-        return Response({
-            'total_mes': total,
-            'quantidade': quantidade,
-            'media_diaria': total / quantidade if quantidade > 0 else 0,
+        # Uma única consulta para todos os indicadores
+        resumo = queryset.aggregate(
+            total=Coalesce(Sum('valor'), Decimal('0')),
+            quantidade=Count('id'),
+            media=Avg('valor'),
+            menor=Min('valor'),
+            maior=Max('valor')
+        )
+        dias = (data_final - data_inicial).days + 1
+        
+        dados = {
+            'total_mes': resumo['total'],
+            'quantidade': resumo['quantidade'],
+            'media_diaria': (resumo['total'] / dias).quantize(CENTAVO),
+            'media_por_despesa': _centavos(resumo['media']) or Decimal('0'),
+            'menor_despesa': resumo['menor'],
+            'maior_despesa': resumo['maior'],
             'periodo': {
                 'inicio': data_inicial,
-                'fim': data_final
+                'fim': data_final,
+                'dias': dias
             }
-        })
+        }
+        
+        if granularidade:
+            dados['granularidade'] = granularidade
+            dados['serie'] = self._serie(queryset, data_inicial, data_final, granularidade)
+        
+        return Response(dados)
+    
+    def _serie(self, queryset, data_inicial, data_final, granularidade):
+        """Totais por dia, semana (começando na segunda) ou mês, a partir de uma consulta agrupada por dia"""
+        periodos = {}
+        data = inicio_periodo(data_inicial, granularidade)
+        while data <= data_final:
+            periodos[data] = {'inicio': data, 'total': Decimal('0'), 'quantidade': 0}
+            data = proximo_periodo(data, granularidade)
+        
+        por_dia = queryset.values('data').annotate(total=Sum('valor'), quantidade=Count('id'))
+        for linha in por_dia:
+            periodo = periodos[inicio_periodo(linha['data'], granularidade)]
+            periodo['total'] += linha['total']
+            periodo['quantidade'] += linha['quantidade']
+        
+        return list(periodos.values())
     
     @action(detail=False, methods=['get'])
     def por_categoria(self, request):
-        """Retorna despesas agrupadas por categoria"""
-        queryset = self.get_queryset()
-        
-        # Agrupar por categoria
-        categorias = {}
-        for despesa in queryset:
-            cat_nome = despesa.categoria.nome
-            if cat_nome not in categorias:
-                categorias[cat_nome] = {
-                    'nome': cat_nome,
-                    'cor': despesa.categoria.cor,
-                    'total': 0,
-                    'quantidade': 0
-                }
-            
-            categorias[cat_nome]['total'] += float(despesa.valor)
-            categorias[cat_nome]['quantidade'] += 1
-        
-        return Response(list(categorias.values()))
+        """Despesas agrupadas por categoria (aceita os mesmos filtros da listagem)"""
+        categorias = self.get_queryset().order_by().values(
+            'categoria_id',
+            nome=F('categoria__nome'),
+            cor=F('categoria__cor')
+        ).annotate(
+            total=Sum('valor'),
+            quantidade=Count('id'),
+            media=Avg('valor'),
+            menor=Min('valor'),
+            maior=Max('valor')
+        ).order_by('-total', 'nome')
+        
+        resultado = []
+        for categoria in categorias:
+            categoria['media'] = _centavos(categoria['media'])
+            resultado.append(categoria)
+        
+        return Response(resultado)
 
 class RelatorioViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
     
+    def _responder(self, request, tipo):
+        """
+        Calcula o relatório `tipo` com os parâmetros da query string (400 se inválidos).
+
+        O cabeçalho Server-Timing traz a duração de cada seção e o total;
+        com seções em paralelo, o total acompanha a mais lenta.
+        """
+        tempos = {}
+        inicio = time.perf_counter()
+        try:
+            dados = gerar_relatorio(tipo, request.user, request.query_params, tempos)
+        except ValueError as erro:
+            return Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+        tempos['total'] = (time.perf_counter() - inicio) * 1000
+
+        response = Response(dados)
+        response['Server-Timing'] = cabecalho_server_timing(tempos)
+        return response
+
     @action(detail=False, methods=['get'])
+    @cache_relatorio
     def mensal(self, request):
-        """Relatório mensal de contas e despesas"""
-        mes = request.query_params.get('mes', timezone.now().month)
-        ano = request.query_params.get('ano', timezone.now().year)
-        
-        # Calcular datas do mês
-        data_inicio = datetime(ano, mes, 1).date()
-        if mes == 12:
-            data_fim = datetime(ano + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            data_fim = datetime(ano, mes + 1, 1).date() - timedelta(days=1)
-        
-        # Contas do mês
-        contas_mes = ContaPagar.objects.filter(
-            usuario=request.user,
-            data_vencimento__gte=data_inicio,
-            data_vencimento__lte=data_fim
-        )
-        
-        # Despesas do mês
-        despesas_mes = DespesaDiaria.objects.filter(
-            usuario=request.user,
-            data__gte=data_inicio,
-            data__lte=data_fim
-        )
-        
-        # Estatísticas de contas
-        contas_pendentes = contas_mes.filter(status='pendente')
-        contas_pagas = contas_mes.filter(status='pago')
-        
-        total_contas_pendentes = contas_pendentes.aggregate(total=Sum('valor'))['total'] or 0
-        total_contas_pagas = contas_pagas.aggregate(total=Sum('valor'))['total'] or 0
-        total_despesas = despesas_mes.aggregate(total=Sum('valor'))['total'] or 0
-        
-        # Contas por categoria
-        contas_por_categoria = {}
-        for conta in contas_mes:
-            cat_nome = conta.categoria.nome
-            if cat_nome not in contas_por_categoria:
-                contas_por_categoria[cat_nome] = {
-                    'nome': cat_nome,
-                    'cor': conta.categoria.cor,
-                    'pendente': 0,
-                    'pago': 0,
-                    'total': 0
-                }
-            
-            contas_por_categoria[cat_nome]['total'] += float(conta.valor)
-            if conta.status == 'pendente':
-                contas_por_categoria[cat_nome]['pendente'] += float(conta.valor)
-            else:
-                contas_por_categoria[cat_nome]['pago'] += float(conta.valor)
-        
-        # Despesas por categoria
-        despesas_por_categoria = {}
-        for despesa in despesas_mes:
-            cat_nome = despesa.categoria.nome
-            if cat_nome not in despesas_por_categoria:
-                despesas_por_categoria[cat_nome] = {
-                    'nome': cat_nome,
-                    'cor': despesa.categoria.cor,
-                    'total': 0,
-                    'quantidade': 0
-                }
-            
-            despesas_por_categoria[cat_nome]['total'] += float(despesa.valor)
-            despesas_por_categoria[cat_nome]['quantidade'] += 1
-        
-        return Response({
-            'periodo': {
-                'mes': mes,
-                'ano': ano,
-                'data_inicio': data_inicio,
-                'data_fim': data_fim
-            },
-            'resumo': {
-                'contas_pendentes': total_contas_pendentes,
-                'contas_pagas': total_contas_pagas,
-                'total_contas': total_contas_pendentes + total_contas_pagas,
-                'despesas': total_despesas,
-                'saldo': (total_contas_pagas - total_despesas)
-            },
-            'contas_por_categoria': list(contas_por_categoria.values()),
-            'despesas_por_categoria': list(despesas_por_categoria.values()),
-            'contas_pendentes_detalhadas': ContaPagarSerializer(contas_pendentes, many=True).data,
-            'contas_pagas_detalhadas': ContaPagarSerializer(contas_pagas, many=True).data,
-            'despesas_detalhadas': DespesaDiariaSerializer(despesas_mes, many=True).data
-        })
-    
-    @action(detail=False, methods=['get'])
-    def por_categoria(self, request):
-        """Análise detalhada por categoria"""
-        data_inicial = request.query_params.get('data_inicial')
-        data_final = request.query_params.get('data_final')
-        
-        # Se não especificou datas, usar últimos 6 meses
-        if not data_inicial and not data_final:
-            hoje = timezone.now().date()
-            data_final = hoje
-            data_inicial = hoje - timedelta(days=180)
-        
-        # Contas por categoria
+        """Relatório mensal de contas e despesas (as listas detalhadas ficam em mensal/contas e mensal/despesas)"""
+        return self._responder(request, 'mensal')
+
+    @action(detail=False, methods=['get'], url_path='mensal/contas')
+    @cache_relatorio
+    def mensal_contas(self, request):
+        """Contas do mês, paginadas (status=pendente|pago|vencido|cancelado, padrão pendente)"""
+        try:
+            periodo = ler_parametros_mensal(request.query_params)
+        except ValueError as erro:
+            return Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+
         contas = ContaPagar.objects.filter(
             usuario=request.user,
-            data_vencimento__gte=data_inicial,
-            data_vencimento__lte=data_final
+            data_vencimento__range=(periodo['data_inicio'], periodo['data_fim']),
+            status=request.query_params.get('status', 'pendente')
+        ).order_by('data_vencimento', 'id').values(
+            'id', 'descricao', 'valor', 'data_vencimento', 'status',
+            categoria_nome=F('categoria__nome'),
+            categoria_cor=F('categoria__cor')
         )
-        
-        # Despesas por categoria
+
+        paginador = PaginacaoDetalhes()
+        pagina = paginador.paginate_queryset(contas, request, view=self)
+        return paginador.get_paginated_response(pagina)
+
+    @action(detail=False, methods=['get'], url_path='mensal/despesas')
+    @cache_relatorio
+    def mensal_despesas(self, request):
+        """Despesas do mês, paginadas"""
+        try:
+            periodo = ler_parametros_mensal(request.query_params)
+        except ValueError as erro:
+            return Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+
         despesas = DespesaDiaria.objects.filter(
             usuario=request.user,
-            data__gte=data_inicial,
-            data__lte=data_final
+            data__range=(periodo['data_inicio'], periodo['data_fim'])
+        ).order_by('-data', 'id').values(
+            'id', 'descricao', 'valor', 'data',
+            categoria_nome=F('categoria__nome'),
+            categoria_cor=F('categoria__cor')
         )
-        
-        # Agrupar contas por categoria
-        contas_por_categoria = {}
-        for conta in contas:
-            cat_nome = conta.categoria.nome
-            if cat_nome not in contas_por_categoria:
-                contas_por_categoria[cat_nome] = {
-                    'nome': cat_nome,
-                    'cor': conta.categoria.cor,
-                    'contas_pendentes': 0,
-                    'contas_pagas': 0,
-                    'total_contas': 0,
-                    'quantidade_contas': 0,
-                    'despesas': 0,
-                    'quantidade_despesas': 0
-                }
-            
-            contas_por_categoria[cat_nome]['total_contas'] += float(conta.valor)
-            contas_por_categoria[cat_nome]['quantidade_contas'] += 1
-            
-            if conta.status == 'pendente':
-                contas_por_categoria[cat_nome]['contas_pendentes'] += float(conta.valor)
-            else:
-                contas_por_categoria[cat_nome]['contas_pagas'] += float(conta.valor)
-        
-        # Agrupar despesas por categoria
-        for despesa in despesas:
-            cat_nome = despesa.categoria.nome
-            if cat_nome not in contas_por_categoria:
-                contas_por_categoria[cat_nome] = {
-                    'nome': cat_nome,
-                    'cor': despesa.categoria.cor,
-                    'contas_pendentes': 0,
-                    'contas_pagas': 0,
-                    'total_contas': 0,
-                    'quantidade_contas': 0,
-                    'despesas': 0,
-                    'quantidade_despesas': 0
-                }
-            
-            contas_por_categoria[cat_nome]['despesas'] += float(despesa.valor)
-            contas_por_categoria[cat_nome]['quantidade_despesas'] += 1
-        
-        # Calcular totais e percentuais
-        resultado = []
-        for categoria in contas_por_categoria.values():
-            total_categoria = categoria['total_contas'] + categoria['despesas']
-            categoria['total_geral'] = total_categoria
-            categoria['percentual_contas'] = (categoria['total_contas'] / total_categoria * 100) if total_categoria > 0 else 0
-            categoria['percentual_despesas'] = (categoria['despesas'] / total_categoria * 100) if total_categoria > 0 else 0
-            resultado.append(categoria)
-        
-        # Ordenar por total geral
-        resultado.sort(key=lambda x: x['total_geral'], reverse=True)
-        
-        return Response({
-            'periodo': {
-                'inicio': data_inicial,
-                'fim': data_final
-            },
-            'categorias': resultado,
-            'resumo': {
-                'total_contas': sum(cat['total_contas'] for cat in resultado),
-                'total_despesas': sum(cat['despesas'] for cat in resultado),
-                'total_geral': sum(cat['total_geral'] for cat in resultado)
-            }
-        })
+
+        paginador = PaginacaoDetalhes()
+        pagina = paginador.paginate_queryset(despesas, request, view=self)
+        return paginador.get_paginated_response(pagina)
+
+    @action(detail=False, methods=['get'])
+    @cache_relatorio
+    def por_categoria(self, request):
+        """Análise detalhada por categoria (para períodos longos, prefira uma tarefa em relatorios-tarefas)"""
+        return self._responder(request, 'por_categoria')
+    
+    @action(detail=False, methods=['get'])
+    @cache_relatorio
+    def fluxo_caixa(self, request):
+        """Projeção das contas a pagar nos próximos meses, incluindo as recorrências ainda não geradas"""
+        return self._responder(request, 'fluxo_caixa')
     
     @action(detail=False, methods=['get'])
+    @cache_relatorio
     def evolucao_gastos(self, request):
         """Evolução de gastos ao longo do tempo"""
-        meses = int(request.query_params.get('meses', 6))
-        
-        hoje = timezone.now().date()
-        data_inicial = hoje - timedelta(days=meses * 30)
-        
-        # Gerar lista de meses
-        meses_dados = []
-        for i in range(meses):
-            data_mes = hoje - timedelta(days=i * 30)
-            mes_inicio = data_mes.replace(day=1)
-            if data_mes.month == 12:
-                mes_fim = data_mes.replace(year=data_mes.year + 1, month=1, day=1) - timedelta(days=1)
-            else:
-                mes_fim = data_mes.replace(month=data_mes.month + 1, day=1) - timedelta(days=1)
-            
-            # Contas do mês
-            contas_mes = ContaPagar.objects.filter(
-                usuario=request.user,
-                data_vencimento__gte=mes_inicio,
-                data_vencimento__lte=mes_fim
+        return self._responder(request, 'evolucao_gastos')
+
+class TarefaRelatorioViewSet(viewsets.ModelViewSet):
+    """
+    Relatórios calculados em segundo plano pelo worker (manage.py run_report_worker).
+
+    POST com tipo, formato (json ou csv) e parametros (os mesmos da query
+    string do relatório síncrono) cria a tarefa e retorna 202 com o id;
+    o status é acompanhado em GET /<id>/ e o resultado baixado em
+    GET /<id>/download/.
+    """
+    serializer_class = TarefaRelatorioSerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+    
+    def get_queryset(self):
+        return TarefaRelatorio.objects.filter(usuario=self.request.user)
+    
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+    
+    def perform_destroy(self, instance):
+        apagar_arquivo(instance)
+        instance.delete()
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Arquivo do relatório; enviado compactado quando o cliente aceita gzip"""
+        tarefa = self.get_object()
+        
+        if tarefa.status == 'expirado' or (tarefa.expira_em and tarefa.expira_em <= timezone.now()):
+            return Response(
+                {'error': 'O relatório expirou; crie uma nova tarefa'},
+                status=status.HTTP_410_GONE
             )
-            
-            # Despesas do mês
-            despesas_mes = DespesaDiaria.objects.filter(
-                usuario=request.user,
-                data__gte=mes_inicio,
-                data__lte=mes_fim
+        if tarefa.status != 'concluido':
+            return Response(
+                {'error': 'O relatório ainda não está pronto', 'status': tarefa.status},
+                status=status.HTTP_409_CONFLICT
             )
-            
-            total_contas = contas_mes.aggregate(total=Sum('valor'))['total'] or 0
-            total_despesas = despesas_mes.aggregate(total=Sum('valor'))['total'] or 0
-            
-            meses_dados.append({
-                'mes': mes_inicio.strftime('%B/%Y'),
-                'mes_numero': mes_inicio.month,
-                'ano': mes_inicio.year,
-                'contas': float(total_contas),
-                'despesas': float(total_despesas),
-                'total': float(total_contas + total_despesas),
-                'quantidade_contas': contas_mes.count(),
-                'quantidade_despesas': despesas_mes.count()
-            })
-        
-        # Ordenar por data (mais antigo primeiro)
-        meses_dados.reverse()
         
-        return Response({
-            'periodo_meses': meses,
-            'dados': meses_dados,
-            'resumo': {
-                'total_contas': sum(mes['contas'] for mes in meses_dados),
-                'total_despesas': sum(mes['despesas'] for mes in meses_dados),
-                'total_geral': sum(mes['total'] for mes in meses_dados),
-                'media_mensal_contas': sum(mes['contas'] for mes in meses_dados) / len(meses_dados),
-                'media_mensal_despesas': sum(mes['despesas'] for mes in meses_dados) / len(meses_dados)
-            }
-        })
-
+        nome = f'relatorio-{tarefa.tipo}-{tarefa.pk}.{tarefa.formato}'
+        arquivo = tarefa.arquivo.open('rb')
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response = FileResponse(arquivo, as_attachment=True, filename=nome, content_type=TIPOS_CONTEUDO[tarefa.formato])
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = FileResponse(gzip.GzipFile(fileobj=arquivo), as_attachment=True, filename=nome, content_type=TIPOS_CONTEUDO[tarefa.formato])
+        response['Vary'] = 'Accept-Encoding'
+        return response
@@ -0,0 +1,60 @@
+import csv
+from datetime import date
+from decimal import Decimal
+from django.http import StreamingHttpResponse
+
+TAMANHO_LOTE = 2000
+
+
+class _Eco:
+    """Pseudo-arquivo: o csv.writer devolve a linha formatada em vez de gravá-la"""
+    def write(self, valor):
+        return valor
+
+
+def _formatar(valor):
+    """Formata valores no padrão brasileiro, como o Excel pt-BR espera"""
+    if valor is None:
+        return ''
+    if isinstance(valor, Decimal):
+        return str(valor).replace('.', ',')
+    if isinstance(valor, date):
+        return valor.strftime('%d/%m/%Y')
+    return valor
+
+
+def _linhas_csv(cabecalho, linhas):
+    escritor = csv.writer(_Eco(), delimiter=';')
+    # BOM para o Excel reconhecer o arquivo como UTF-8
+    yield '\ufeff' + escritor.writerow(cabecalho)
+
+    lote = []
+    for linha in linhas:
+        lote.append(escritor.writerow([_formatar(valor) for valor in linha]))
+        if len(lote) >= TAMANHO_LOTE:
+            yield ''.join(lote)
+            lote = []
+    if lote:
+        yield ''.join(lote)
+
+
+def resposta_csv(nome_arquivo, colunas, queryset):
+    """
+    Gera um CSV em streaming a partir de um queryset.
+
+    `colunas` é uma lista de pares (título, campo do values_list). As linhas
+    são lidas com `.iterator()`, então a memória usada não depende da
+    quantidade de registros exportados.
+    """
+    cabecalho = [titulo for titulo, _ in colunas]
+    campos = [campo for _, campo in colunas]
+    linhas = queryset.values_list(*campos).iterator(chunk_size=TAMANHO_LOTE)
+
+    response = StreamingHttpResponse(_linhas_csv(cabecalho, linhas), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    return response
+
+
+def conteudo_csv(cabecalho, linhas):
+    """CSV completo em uma string, no mesmo formato de resposta_csv (para gravar em arquivo)"""
+    return ''.join(_linhas_csv(cabecalho, linhas))
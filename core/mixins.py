@@ -0,0 +1,66 @@
+import hashlib
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class ETagListMixin:
+    """
+    GET condicional (ETag / Last-Modified) para a ação `list` de um ViewSet.
+
+    A versão dos dados é calculada com uma única agregação (último
+    `atualizado_em` e quantidade de linhas) sobre cada queryset retornado por
+    `get_querysets_versao()`; modelos sem `atualizado_em` entram com o maior
+    pk. A data de hoje também faz parte da versão, pois as listagens trazem
+    campos calculados a partir dela (esta_vencida, dias_para_vencimento).
+    Se o cliente já tem essa versão, a resposta é um 304 sem nenhuma
+    serialização.
+    """
+    campo_versao = 'atualizado_em'
+
+    def get_querysets_versao(self):
+        """Querysets cujas alterações invalidam a listagem (padrão: o próprio queryset filtrado)"""
+        return [self.filter_queryset(self.get_queryset())]
+
+    def _calcular_versao(self, request):
+        partes = [str(request.user.pk or 'anonimo'), request.get_full_path(), str(timezone.localdate())]
+        ultima_alteracao = None
+
+        for queryset in self.get_querysets_versao():
+            try:
+                queryset.model._meta.get_field(self.campo_versao)
+            except FieldDoesNotExist:
+                # Sem data de alteração: inclusões e exclusões ainda mudam o maior pk e a quantidade
+                dados = queryset.order_by().aggregate(ultimo=Max('pk'), total=Count('pk'))
+                partes.append(f"{dados['total']}:{dados['ultimo'] or ''}")
+                continue
+
+            dados = queryset.order_by().aggregate(ultimo=Max(self.campo_versao), total=Count('pk'))
+            partes.append(f"{dados['total']}:{dados['ultimo'].isoformat() if dados['ultimo'] else ''}")
+            if dados['ultimo'] and (ultima_alteracao is None or dados['ultimo'] > ultima_alteracao):
+                ultima_alteracao = dados['ultimo']
+
+        etag = quote_etag(hashlib.md5('|'.join(partes).encode()).hexdigest())
+        return etag, ultima_alteracao
+
+    def list(self, request, *args, **kwargs):
+        etag, ultima_alteracao = self._calcular_versao(request)
+
+        # Só o If-None-Match é respeitado: a data sozinha não detecta exclusões
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        etags_cliente = {tag.removeprefix('W/') for tag in parse_etags(if_none_match)}
+
+        if etag in etags_cliente or '*' in etags_cliente:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().list(request, *args, **kwargs)
+
+        response['ETag'] = etag
+        if ultima_alteracao:
+            response['Last-Modified'] = http_date(ultima_alteracao.timestamp())
+        # Força o navegador a revalidar a cada uso, enviando o If-None-Match
+        response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,23 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class PaginacaoDetalhes(PageNumberPagination):
+    """Paginação para listas de detalhes carregadas sob demanda"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class PaginacaoCursor(CursorPagination):
+    """
+    Paginação por cursor (keyset) para listagens grandes.
+
+    A ordenação é definida pela view em `ordenacao_cursor` e deve terminar
+    em um campo único (normalmente o id) para que o cursor seja estável.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'ordenacao_cursor', ('-id',))
@@ -0,0 +1,80 @@
+"""
+Execução de seções independentes de um relatório, com medição de tempo.
+
+No PostgreSQL as seções rodam em um pool de threads limitado; cada thread
+usa a sua própria conexão (o Django mantém uma conexão por thread), aberta
+e fechada como em uma requisição. No SQLite, dentro de transações (cujos
+dados as outras conexões não enxergam) ou com um único thread configurado,
+as seções rodam em sequência.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+MAX_THREADS = getattr(settings, 'RELATORIOS_MAX_THREADS', 4)
+
+_executor = None
+_criacao = threading.Lock()
+_local = threading.local()
+
+
+def _obter_executor():
+    global _executor
+    with _criacao:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_THREADS, thread_name_prefix='secao-relatorio')
+    return _executor
+
+
+def pode_paralelizar():
+    return (
+        MAX_THREADS > 1
+        and connection.vendor == 'postgresql'
+        and not connection.in_atomic_block
+        # Uma seção que abre seções roda tudo no próprio thread: evita esgotar o pool
+        and not getattr(_local, 'em_secao', False)
+    )
+
+
+def _medir(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return resultado, (time.perf_counter() - inicio) * 1000
+
+
+def _executar_no_pool(funcao):
+    _local.em_secao = True
+    close_old_connections()
+    try:
+        return _medir(funcao)
+    finally:
+        close_old_connections()
+        _local.em_secao = False
+
+
+def executar_secoes(secoes, tempos=None):
+    """
+    Executa {nome: função sem argumentos} e retorna {nome: resultado}.
+
+    As funções devem materializar as consultas (list(), aggregate()...) para
+    que o acesso ao banco aconteça dentro da seção. A duração de cada uma,
+    em milissegundos, é gravada em `tempos` quando informado.
+    """
+    if len(secoes) > 1 and pode_paralelizar():
+        executor = _obter_executor()
+        futuros = {nome: executor.submit(_executar_no_pool, funcao) for nome, funcao in secoes.items()}
+        medidos = {nome: futuro.result() for nome, futuro in futuros.items()}
+    else:
+        medidos = {nome: _medir(funcao) for nome, funcao in secoes.items()}
+
+    if tempos is not None:
+        for nome, (_, duracao) in medidos.items():
+            tempos[nome] = duracao
+    return {nome: resultado for nome, (resultado, _) in medidos.items()}
+
+
+def cabecalho_server_timing(tempos):
+    """Valor do cabeçalho Server-Timing (exibido nas ferramentas de desenvolvedor do navegador)"""
+    return ', '.join(f'{nome};dur={duracao:.1f}' for nome, duracao in tempos.items())
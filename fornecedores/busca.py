@@ -0,0 +1,220 @@
+"""
+Busca de fornecedores por documento ou por texto.
+
+- Documento (o termo só tem dígitos e pontuação): busca exata ou por
+  prefixo no índice de `documento_digitos`, então "12345678" encontra
+  "12.345.678/0001-90".
+- Texto: o termo é normalizado como `texto_busca` (minúsculas, sem
+  acentos, pontuação como espaço) e cada palavra precisa aparecer. No
+  PostgreSQL usa o índice trigram (pg_trgm) de `texto_busca` e ordena pela
+  similaridade; no SQLite usa a tabela FTS5 `fornecedores_fornecedor_busca`,
+  mantida pelos sinais, com prefixo em cada palavra e ordenação por bm25.
+
+O autocomplete é mais simples: prefixo do documento ou do nome (início de
+`texto_busca`), no índice (usuario, texto_busca), com um LRU por processo
+dos prefixos mais digitados.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+TABELA_FTS = 'fornecedores_fornecedor_busca'
+MIN_DIGITOS_DOCUMENTO = 3
+LIMITE_AUTOCOMPLETE = 10
+MAXIMO_AUTOCOMPLETE = 50
+TAMANHO_CACHE_AUTOCOMPLETE = getattr(settings, 'FORNECEDORES_AUTOCOMPLETE_CACHE', 512)
+TEMPO_CACHE_AUTOCOMPLETE = getattr(settings, 'FORNECEDORES_AUTOCOMPLETE_TIMEOUT', 60)
+
+_NAO_DIGITOS = re.compile(r'\D')
+_SEPARADORES = re.compile(r'[^0-9a-z]+')
+_DOCUMENTO = re.compile(r'^[\d.\-/\s]+$')
+_fts_disponivel = None
+
+
+def somente_digitos(valor):
+    return _NAO_DIGITOS.sub('', valor or '')
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e com a pontuação trocada por espaços: 'São João-ME' -> 'sao joao me'"""
+    sem_acentos = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return ' '.join(parte for parte in _SEPARADORES.split(sem_acentos.lower()) if parte)
+
+
+def texto_busca(fornecedor):
+    """Conteúdo indexado para a busca por texto: nome, cidade e ramo de atividade"""
+    return normalizar(' '.join([fornecedor.nome, fornecedor.cidade, fornecedor.ramo_atividade]))
+
+
+def fts_disponivel():
+    """True se o banco é SQLite e a migração conseguiu criar a tabela FTS5"""
+    global _fts_disponivel
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts_disponivel is None:
+        _fts_disponivel = TABELA_FTS in connection.introspection.table_names()
+    return _fts_disponivel
+
+
+def indexar(fornecedor):
+    """Grava (ou regrava) o fornecedor na tabela FTS5"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA_FTS} WHERE rowid = %s', [fornecedor.pk])
+        cursor.execute(
+            f'INSERT INTO {TABELA_FTS} (rowid, texto_busca) VALUES (%s, %s)',
+            [fornecedor.pk, fornecedor.texto_busca]
+        )
+
+
+def remover_do_indice(fornecedor_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA_FTS} WHERE rowid = %s', [fornecedor_id])
+
+
+class ResultadoFTS:
+    """
+    Resultado da busca FTS5, paginável como um queryset (count() e fatias).
+
+    Só a página pedida é lida da tabela FTS (ORDER BY rank LIMIT/OFFSET);
+    os fornecedores da página vêm do queryset original, que também restringe
+    a busca (usuário, status, anotações). O CROSS JOIN fixa a tabela FTS
+    como laço externo: com `rowid IN (...)` ou um JOIN comum o SQLite pode
+    percorrer os fornecedores e repetir o MATCH para cada um.
+    """
+    def __init__(self, queryset, palavras):
+        self.queryset = queryset
+        sql, parametros = queryset.order_by().values('id').query.sql_with_params()
+        expressao = ' '.join(f'"{palavra}"*' for palavra in palavras)
+        self._origem = (
+            f'FROM {TABELA_FTS} CROSS JOIN ({sql}) AS base ON base.id = {TABELA_FTS}.rowid '
+            f'WHERE {TABELA_FTS} MATCH %s'
+        )
+        self._parametros = [*parametros, expressao]
+
+    def count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) {self._origem}', self._parametros)
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, fatia):
+        inicio = fatia.start or 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {TABELA_FTS}.rowid {self._origem} ORDER BY rank, {TABELA_FTS}.rowid LIMIT %s OFFSET %s',
+                [*self._parametros, fatia.stop - inicio, inicio]
+            )
+            ids = [linha[0] for linha in cursor.fetchall()]
+        fornecedores = self.queryset.in_bulk(ids)
+        return [fornecedores[fornecedor_id] for fornecedor_id in ids if fornecedor_id in fornecedores]
+
+
+def _prefixo(campo, prefixo):
+    """Filtro "campo começa com prefixo" que usa o índice do campo"""
+    if connection.vendor == 'sqlite':
+        # O LIKE do SQLite não usa índice. Os campos de busca só têm
+        # [0-9a-z ], e na ordem binária '~' vem depois de todos eles, então
+        # a faixa [prefixo, prefixo + '~') é o prefixo
+        return Q(**{f'{campo}__gte': prefixo, f'{campo}__lt': prefixo + '~'})
+    # No PostgreSQL a comparação segue a collation do banco; o LIKE 'x%'
+    # usa os índices *_pattern_ops
+    return Q(**{f'{campo}__startswith': prefixo})
+
+
+def buscar_fornecedores(queryset, termo):
+    """Fornecedores do queryset que correspondem ao termo, do mais para o menos relevante"""
+    digitos = somente_digitos(termo)
+    if _DOCUMENTO.match(termo) and len(digitos) >= MIN_DIGITOS_DOCUMENTO:
+        # O documento igual ao termo é o menor com esse prefixo: vem primeiro
+        return queryset.filter(_prefixo('documento_digitos', digitos)).order_by('documento_digitos', 'id')
+
+    palavras = normalizar(termo).split()
+    if not palavras:
+        return queryset.none()
+
+    if fts_disponivel():
+        return ResultadoFTS(queryset, palavras)
+
+    filtro = Q()
+    for palavra in palavras:
+        filtro &= Q(texto_busca__contains=palavra)
+    queryset = queryset.filter(filtro)
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        return queryset.annotate(
+            relevancia=TrigramWordSimilarity(' '.join(palavras), 'texto_busca')
+        ).order_by('-relevancia', 'nome', 'id')
+
+    # Outros bancos: sem índice de texto; quem começa com o termo vem primeiro
+    return queryset.annotate(
+        relevancia=Case(When(texto_busca__startswith=palavras[0], then=Value(0)), default=Value(1), output_field=IntegerField())
+    ).order_by('relevancia', 'nome', 'id')
+
+
+class CachePrefixos:
+    """
+    LRU por processo das respostas do autocomplete.
+
+    Os sinais limpam as entradas do usuário quando um fornecedor dele muda
+    neste processo; alterações feitas em outros processos aparecem quando a
+    entrada expira (TEMPO_CACHE_AUTOCOMPLETE segundos).
+    """
+    def __init__(self, tamanho, tempo):
+        self.tamanho = tamanho
+        self.tempo = tempo
+        self._entradas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def get(self, chave):
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            expira_em, valor = entrada
+            if expira_em < time.monotonic():
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor):
+        with self._trava:
+            self._entradas[chave] = (time.monotonic() + self.tempo, valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.tamanho:
+                self._entradas.popitem(last=False)
+
+    def limpar_usuario(self, usuario_id):
+        # A chave começa pelo usuário; sem usuário (None) é a lista pública de ativos
+        with self._trava:
+            for chave in [chave for chave in self._entradas if chave[0] in (usuario_id, None)]:
+                del self._entradas[chave]
+
+
+cache_autocomplete = CachePrefixos(TAMANHO_CACHE_AUTOCOMPLETE, TEMPO_CACHE_AUTOCOMPLETE)
+
+
+def autocompletar(queryset, usuario_id, termo, limite=LIMITE_AUTOCOMPLETE):
+    """
+    Até `limite` fornecedores do queryset cujo documento ou nome começa com
+    o termo, como dicts {id, nome, cnpj_cpf}. `usuario_id` identifica o
+    queryset no cache (None para a lista pública).
+    """
+    if _DOCUMENTO.match(termo):
+        campo, prefixo = 'documento_digitos', somente_digitos(termo)
+    else:
+        campo, prefixo = 'texto_busca', normalizar(termo)
+
+    chave = (usuario_id, campo, prefixo, limite)
+    resultados = cache_autocomplete.get(chave)
+    if resultados is None:
+        if prefixo:
+            queryset = queryset.filter(_prefixo(campo, prefixo))
+        resultados = list(queryset.order_by(campo, 'id').values('id', 'nome', 'cnpj_cpf')[:limite])
+        cache_autocomplete.set(chave, resultados)
+    return resultados
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:47
+
+from django.db import migrations, models
+from fornecedores.busca import TABELA_FTS, somente_digitos, texto_busca
+
+
+def preencher_campos_busca(apps, schema_editor):
+    """Calcula documento_digitos e texto_busca dos fornecedores existentes"""
+    Fornecedor = apps.get_model('fornecedores', 'Fornecedor')
+    fornecedores = list(Fornecedor.objects.only('id', 'cnpj_cpf', 'nome', 'cidade', 'ramo_atividade'))
+    for fornecedor in fornecedores:
+        fornecedor.documento_digitos = somente_digitos(fornecedor.cnpj_cpf)
+        fornecedor.texto_busca = texto_busca(fornecedor)
+    Fornecedor.objects.bulk_update(fornecedores, ['documento_digitos', 'texto_busca'], batch_size=500)
+
+
+def criar_indice_texto(apps, schema_editor):
+    """Índice trigram no PostgreSQL; tabela FTS5 no SQLite (se o SQLite tiver FTS5)"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS fornecedor_busca_trgm_idx '
+            'ON fornecedores_fornecedor USING gin (texto_busca gin_trgm_ops)'
+        )
+    elif vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                return
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {TABELA_FTS} USING fts5(texto_busca, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO {TABELA_FTS} (rowid, texto_busca) SELECT id, texto_busca FROM fornecedores_fornecedor'
+        )
+
+
+def remover_indice_texto(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS fornecedor_busca_trgm_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABELA_FTS}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fornecedores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fornecedor',
+            name='documento_digitos',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=14, verbose_name='CNPJ/CPF (dígitos)'),
+        ),
+        migrations.AddField(
+            model_name='fornecedor',
+            name='texto_busca',
+            field=models.TextField(blank=True, editable=False, verbose_name='Texto de busca'),
+        ),
+        migrations.RunPython(preencher_campos_busca, migrations.RunPython.noop),
+        migrations.RunPython(criar_indice_texto, remover_indice_texto),
+    ]
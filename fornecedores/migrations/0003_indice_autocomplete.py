@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fornecedores', '0002_busca'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fornecedor',
+            index=models.Index(fields=['usuario', 'texto_busca'], name='fornecedor_prefixo_idx', opclasses=['int4_ops', 'text_pattern_ops']),
+        ),
+    ]
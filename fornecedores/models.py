@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
+from .busca import somente_digitos, texto_busca
 
 class Fornecedor(models.Model):
     TIPO_CHOICES = [
@@ -72,14 +73,36 @@ class Fornecedor(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name='Criado em')
     atualizado_em = models.DateTimeField(auto_now=True, verbose_name='Atualizado em')
     
+    # Busca (calculados no save)
+    documento_digitos = models.CharField(max_length=14, blank=True, db_index=True, editable=False, verbose_name='CNPJ/CPF (dígitos)')
+    texto_busca = models.TextField(blank=True, editable=False, verbose_name='Texto de busca')
+    
     class Meta:
         ordering = ['nome']
         verbose_name = 'Fornecedor'
         verbose_name_plural = 'Fornecedores'
+        indexes = [
+            # Autocomplete: prefixo do nome normalizado dentro dos fornecedores do usuário
+            # (as opclasses só valem no PostgreSQL, onde o LIKE 'x%' precisa de text_pattern_ops)
+            models.Index(
+                fields=['usuario', 'texto_busca'],
+                name='fornecedor_prefixo_idx',
+                opclasses=['int4_ops', 'text_pattern_ops']
+            ),
+        ]
     
     def __str__(self):
         return self.nome
     
+    def save(self, *args, **kwargs):
+        # Mantém os campos de busca em dia com o documento, o nome, a cidade e o ramo
+        self.documento_digitos = somente_digitos(self.cnpj_cpf)
+        self.texto_busca = texto_busca(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'documento_digitos', 'texto_busca'}
+        super().save(*args, **kwargs)
+    
     def get_endereco_completo(self):
         """Retorna o endereço completo formatado"""
         endereco = f"{self.endereco}"
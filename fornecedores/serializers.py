@@ -27,9 +27,10 @@ class FornecedorSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 class FornecedorListSerializer(serializers.ModelSerializer):
-    contatos_count = serializers.SerializerMethodField()
-    contas_count = serializers.SerializerMethodField()
-    total_contas = serializers.SerializerMethodField()
+    # Anotados no queryset da listagem (anotar_totais_lista em views.py)
+    contatos_count = serializers.IntegerField(read_only=True)
+    contas_count = serializers.IntegerField(read_only=True)
+    total_contas = serializers.FloatField(read_only=True)
     
     class Meta:
         model = Fornecedor
@@ -38,43 +39,35 @@ class FornecedorListSerializer(serializers.ModelSerializer):
             'cidade', 'estado', 'status', 'favorito', 'contatos_count',
             'contas_count', 'total_contas', 'criado_em'
         ]
-    
-    def get_contatos_count(self, obj):
-        return obj.contatos.count()
-    
-    def get_contas_count(self, obj):
-        from contas.models import ContaPagar
-        return ContaPagar.objects.filter(fornecedor=obj).count()
-    
-    def get_total_contas(self, obj):
-        from contas.models import ContaPagar
-        from django.db.models import Sum
-        total = ContaPagar.objects.filter(
-            fornecedor=obj, 
-            status='pendente'
-        ).aggregate(total=Sum('valor'))['total'] or 0
-        return float(total)
 
 class FornecedorDetailSerializer(serializers.ModelSerializer):
+    """
+    Detalhe do fornecedor montado a partir do queryset de `retrieve`:
+    totais anotados, contatos pré-carregados e, em `contas_detalhe`, as
+    contas pendentes mais a primeira página das pagas (uma consulta com
+    select_related('categoria')). O restante do histórico de pagas fica
+    em /fornecedores/<id>/contas_pagas/, paginado.
+    """
     contatos = ContatoFornecedorSerializer(many=True, read_only=True)
     endereco_completo = serializers.ReadOnlyField()
     documento_formatado = serializers.ReadOnlyField()
     contato_principal = serializers.ReadOnlyField()
     contas_pendentes = serializers.SerializerMethodField()
     contas_pagas = serializers.SerializerMethodField()
-    total_pendente = serializers.SerializerMethodField()
-    total_pago = serializers.SerializerMethodField()
+    total_pendente = serializers.FloatField(read_only=True)
+    total_pago = serializers.FloatField(read_only=True)
+    quantidade_pendentes = serializers.IntegerField(read_only=True)
+    quantidade_pagas = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Fornecedor
         fields = '__all__'
     
     def get_contas_pendentes(self, obj):
-        from contas.models import ContaPagar
-        contas = ContaPagar.objects.filter(
-            fornecedor=obj, 
-            status='pendente'
-        ).order_by('data_vencimento')
+        contas = sorted(
+            (conta for conta in obj.contas_detalhe if conta.status == 'pendente'),
+            key=lambda conta: (conta.data_vencimento, conta.id)
+        )
         
         return [{
             'id': conta.id,
@@ -86,11 +79,11 @@ class FornecedorDetailSerializer(serializers.ModelSerializer):
         } for conta in contas]
     
     def get_contas_pagas(self, obj):
-        from contas.models import ContaPagar
-        contas = ContaPagar.objects.filter(
-            fornecedor=obj, 
-            status='pago'
-        ).order_by('-data_pagamento')
+        contas = sorted(
+            (conta for conta in obj.contas_detalhe if conta.status == 'pago'),
+            key=lambda conta: (conta.data_pagamento is not None, conta.data_pagamento, conta.id),
+            reverse=True
+        )
         
         return [{
             'id': conta.id,
@@ -99,21 +92,3 @@ class FornecedorDetailSerializer(serializers.ModelSerializer):
             'data_pagamento': conta.data_pagamento,
             'categoria': conta.categoria.nome
         } for conta in contas]
-    
-    def get_total_pendente(self, obj):
-        from contas.models import ContaPagar
-        from django.db.models import Sum
-        total = ContaPagar.objects.filter(
-            fornecedor=obj, 
-            status='pendente'
-        ).aggregate(total=Sum('valor'))['total'] or 0
-        return float(total)
-    
-    def get_total_pago(self, obj):
-        from contas.models import ContaPagar
-        from django.db.models import Sum
-        total = ContaPagar.objects.filter(
-            fornecedor=obj, 
-            status='pago'
-        ).aggregate(total=Sum('valor'))['total'] or 0
-        return float(total) 
\ No newline at end of file
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .busca import cache_autocomplete, fts_disponivel, indexar, remover_do_indice
+from .models import Fornecedor
+
+
+@receiver(post_save, sender=Fornecedor)
+def indexar_fornecedor(sender, instance, **kwargs):
+    """Atualiza a tabela FTS5 do SQLite (no PostgreSQL o índice trigram é da própria tabela)"""
+    if fts_disponivel():
+        indexar(instance)
+
+
+@receiver(post_delete, sender=Fornecedor)
+def remover_fornecedor_do_indice(sender, instance, **kwargs):
+    if fts_disponivel():
+        remover_do_indice(instance.pk)
+
+
+@receiver(post_save, sender=Fornecedor)
+@receiver(post_delete, sender=Fornecedor)
+def limpar_cache_autocomplete(sender, instance, **kwargs):
+    cache_autocomplete.limpar_usuario(instance.usuario_id)
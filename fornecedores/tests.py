@@ -0,0 +1,70 @@
+from datetime import date
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from contas.models import Categoria, ContaPagar
+from fornecedores.models import ContatoFornecedor, Fornecedor
+
+
+class ListagemFornecedoresTest(TestCase):
+    """A listagem anota os totais no queryset: o número de consultas não cresce com os fornecedores"""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('usuario', password='senha')
+        self.categoria = Categoria.objects.create(nome='Serviços')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.criados = 0
+
+    def _criar_fornecedores(self, quantidade):
+        for _ in range(quantidade):
+            self.criados += 1
+            fornecedor = Fornecedor.objects.create(
+                nome=f'Fornecedor {self.criados}',
+                cnpj_cpf=f'{self.criados:02d}.345.678/0001-90',
+                usuario=self.usuario
+            )
+            ContatoFornecedor.objects.create(fornecedor=fornecedor, nome='Contato')
+            ContaPagar.objects.create(
+                descricao='Conta',
+                valor=Decimal('10.00'),
+                data_vencimento=date(2024, 1, 10),
+                categoria=self.categoria,
+                fornecedor=fornecedor,
+                usuario=self.usuario
+            )
+
+    def _listar(self):
+        response = self.client.get('/api/fornecedores/fornecedores/')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_consultas_constantes(self):
+        self._criar_fornecedores(5)
+        with CaptureQueriesContext(connection) as consultas:
+            self._listar()
+
+        self._criar_fornecedores(5)
+        with self.assertNumQueries(len(consultas)):
+            response = self._listar()
+
+        fornecedores = response.json()
+        self.assertEqual(len(fornecedores), 10)
+        self.assertEqual(fornecedores[0]['contatos_count'], 1)
+        self.assertEqual(fornecedores[0]['contas_count'], 1)
+        self.assertEqual(fornecedores[0]['total_contas'], 10.0)
+
+
+class DetalheFornecedorTest(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('usuario', password='senha')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_pk_invalido_e_404(self):
+        response = self.client.get('/api/fornecedores/fornecedores/abc/')
+        self.assertEqual(response.status_code, 404)
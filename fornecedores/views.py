@@ -1,11 +1,18 @@
+from collections import defaultdict
+from decimal import Decimal
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Sum, Count
+from django.db.models import F, Q, Sum, Count, OuterRef, Prefetch, Subquery, Value, IntegerField, DecimalField
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.http import Http404
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from core.mixins import ETagListMixin
+from core.pagination import PaginacaoDetalhes
+from .busca import LIMITE_AUTOCOMPLETE, MAXIMO_AUTOCOMPLETE, autocompletar, buscar_fornecedores
 from .models import Fornecedor, ContatoFornecedor, CategoriaFornecedor
 from .serializers import (
     FornecedorSerializer, 
@@ -36,17 +43,97 @@ def editar_fornecedor_view(request, pk):
     """Página para editar fornecedor"""
     return render(request, 'editar_fornecedor.html')
 
+def _por_fornecedor(queryset, agregado, output_field):
+    """Subconsulta correlacionada com o agregado das linhas de cada fornecedor (0 se não houver nenhuma)"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(fornecedor=OuterRef('pk')).order_by()
+            .values('fornecedor').annotate(valor=agregado).values('valor'),
+            output_field=output_field
+        ),
+        Value(0),
+        output_field=output_field
+    )
+
+def anotar_totais_lista(queryset):
+    """
+    Contatos, contas e total pendente de cada fornecedor, calculados na
+    mesma consulta da listagem.
+
+    São subconsultas, e não Count/Sum sobre joins: juntar contatos e contas
+    na mesma consulta multiplicaria as linhas e inflaria as contagens.
+    """
+    from contas.models import ContaPagar
+    valor = DecimalField(max_digits=14, decimal_places=2)
+    return queryset.annotate(
+        contatos_count=_por_fornecedor(ContatoFornecedor.objects.all(), Count('id'), IntegerField()),
+        contas_count=_por_fornecedor(ContaPagar.objects.all(), Count('id'), IntegerField()),
+        total_contas=_por_fornecedor(ContaPagar.objects.filter(status='pendente'), Sum('valor'), valor)
+    )
+
+def anotar_detalhe(queryset, fornecedor_id):
+    """
+    Queryset do detalhe: totais pendente/pago em agregados condicionais
+    sobre as contas, contatos pré-carregados e uma única consulta de contas
+    (com a categoria) trazendo as pendentes e a primeira página das pagas.
+    """
+    from contas.models import ContaPagar
+    valor = DecimalField(max_digits=14, decimal_places=2)
+    primeira_pagina_pagas = ContaPagar.objects.filter(
+        fornecedor_id=fornecedor_id, status='pago'
+    ).order_by(F('data_pagamento').desc(nulls_last=True), '-id').values('pk')[:PaginacaoDetalhes.page_size]
+    
+    return queryset.annotate(
+        total_pendente=Coalesce(Sum('contapagar__valor', filter=Q(contapagar__status='pendente')), Value(0), output_field=valor),
+        total_pago=Coalesce(Sum('contapagar__valor', filter=Q(contapagar__status='pago')), Value(0), output_field=valor),
+        quantidade_pendentes=Count('contapagar', filter=Q(contapagar__status='pendente')),
+        quantidade_pagas=Count('contapagar', filter=Q(contapagar__status='pago'))
+    ).prefetch_related(
+        'contatos',
+        Prefetch(
+            'contapagar_set',
+            queryset=ContaPagar.objects.filter(
+                Q(status='pendente') | Q(pk__in=Subquery(primeira_pagina_pagas))
+            ).select_related('categoria'),
+            to_attr='contas_detalhe'
+        )
+    )
+
 # Views para API
-class FornecedorViewSet(viewsets.ModelViewSet):
+class FornecedorViewSet(ETagListMixin, viewsets.ModelViewSet):
     permission_classes = []  # Permitir acesso público para listagem
     
-    def get_queryset(self):
+    def _fornecedores(self):
         # Se o usuário está autenticado, filtrar por usuário
         if self.request.user.is_authenticated:
             return Fornecedor.objects.filter(usuario=self.request.user)
         # Se não está autenticado, retornar todos os fornecedores ativos
         return Fornecedor.objects.filter(status='ativo')
     
+    def get_queryset(self):
+        queryset = self._fornecedores()
+        if self.action == 'list':
+            queryset = anotar_totais_lista(queryset)
+        elif self.action == 'retrieve':
+            # O pk da URL entra no filtro das contas pagas: um pk inválido é 404, como no get_object
+            try:
+                fornecedor_id = int(self.kwargs.get(self.lookup_field))
+            except (TypeError, ValueError):
+                raise Http404
+            queryset = anotar_detalhe(queryset, fornecedor_id)
+        return queryset
+    
+    def get_querysets_versao(self):
+        # A listagem também mostra totais das contas de cada fornecedor
+        # (sem as anotações: a versão só precisa de Max/Count)
+        from contas.models import ContaPagar
+        return [
+            self._fornecedores(),
+            ContaPagar.objects.filter(fornecedor__in=self._fornecedores()),
+            # contatos_count: sem atualizado_em, entra com a quantidade e o maior pk
+            ContatoFornecedor.objects.filter(fornecedor__in=self._fornecedores()),
+        ]
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return FornecedorListSerializer
@@ -66,20 +153,29 @@ class FornecedorViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def buscar(self, request):
-        """Busca fornecedores por nome, CNPJ/CPF ou cidade"""
-        query = request.query_params.get('q', '')
+        """Busca fornecedores por CNPJ/CPF (com ou sem pontuação) ou por nome, cidade e ramo, por relevância"""
+        query = request.query_params.get('q', '').strip()
+        fornecedores = anotar_totais_lista(self._fornecedores())
         if query:
-            fornecedores = self.get_queryset().filter(
-                Q(nome__icontains=query) |
-                Q(cnpj_cpf__icontains=query) |
-                Q(cidade__icontains=query) |
-                Q(ramo_atividade__icontains=query)
-            )
-        else:
-            fornecedores = self.get_queryset()
+            fornecedores = buscar_fornecedores(fornecedores, query)
         
-        serializer = self.get_serializer(fornecedores, many=True)
-        return Response(serializer.data)
+        paginador = PaginacaoDetalhes()
+        pagina = paginador.paginate_queryset(fornecedores, request, view=self)
+        serializer = FornecedorListSerializer(pagina, many=True, context=self.get_serializer_context())
+        return paginador.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Sugestões leves (id, nome, cnpj_cpf) pelo início do nome ou do CNPJ/CPF"""
+        query = request.query_params.get('q', '').strip()
+        try:
+            limite = int(request.query_params.get('limite', LIMITE_AUTOCOMPLETE))
+        except ValueError:
+            return Response({'error': 'limite deve ser um número inteiro'}, status=status.HTTP_400_BAD_REQUEST)
+        limite = max(1, min(limite, MAXIMO_AUTOCOMPLETE))
+        
+        usuario_id = request.user.pk if request.user.is_authenticated else None
+        return Response(autocompletar(self._fornecedores(), usuario_id, query, limite))
     
     @action(detail=True, methods=['post'])
     def toggle_favorito(self, request, pk=None):
@@ -90,40 +186,53 @@ class FornecedorViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(fornecedor)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def contas_pagas(self, request, pk=None):
+        """Histórico completo de contas pagas do fornecedor, paginado"""
+        from contas.models import ContaPagar
+        fornecedor = self.get_object()
+        contas = ContaPagar.objects.filter(
+            fornecedor=fornecedor,
+            status='pago'
+        ).order_by(F('data_pagamento').desc(nulls_last=True), '-id').values(
+            'id', 'descricao', 'valor', 'data_pagamento',
+            categoria_nome=F('categoria__nome')
+        )
+        
+        paginador = PaginacaoDetalhes()
+        pagina = paginador.paginate_queryset(contas, request, view=self)
+        return paginador.get_paginated_response(pagina)
+    
     @action(detail=False, methods=['get'])
     def por_cidade(self, request):
         """Agrupa fornecedores por cidade"""
+        from contas.models import ContaPagar
         fornecedores = self.get_queryset().filter(status='ativo')
         
+        # Total de contas pendentes por cidade: uma consulta agrupada sobre as contas
+        # ('' e NULL chegam em linhas separadas e são somados em 'Sem cidade')
+        totais = defaultdict(Decimal)
+        for linha in ContaPagar.objects.filter(
+            fornecedor__in=fornecedores,
+            status='pendente'
+        ).order_by().values(cidade=F('fornecedor__cidade')).annotate(total=Sum('valor')):
+            totais[linha['cidade'] or 'Sem cidade'] += linha['total'] or 0
+        
         cidades = {}
-        for fornecedor in fornecedores:
-            cidade = fornecedor.cidade or 'Sem cidade'
+        for fornecedor in fornecedores.values('id', 'nome', 'tipo', 'telefone', 'email', 'cidade', 'estado'):
+            cidade = fornecedor.pop('cidade') or 'Sem cidade'
+            estado = fornecedor.pop('estado')
             if cidade not in cidades:
                 cidades[cidade] = {
                     'cidade': cidade,
-                    'estado': fornecedor.estado,
+                    'estado': estado,
                     'quantidade': 0,
-                    'total_contas': 0,
+                    'total_contas': float(totais.get(cidade) or 0),
                     'fornecedores': []
                 }
             
             cidades[cidade]['quantidade'] += 1
-            
-            # Calcular total de contas pendentes
-            from contas.models import ContaPagar
-            total_contas = ContaPagar.objects.filter(
-                fornecedor=fornecedor,
-                status='pendente'
-            ).aggregate(total=Sum('valor'))['total'] or 0
-            cidades[cidade]['total_contas'] += float(total_contas)
-            
-            cidades[cidade]['fornecedores'].append({
-                'id': fornecedor.id,
-                'nome': fornecedor.nome,
-                'tipo': fornecedor.tipo,
-                'telefone': fornecedor.telefone,
-                'email': fornecedor.email
-            })
+            cidades[cidade]['fornecedores'].append(fornecedor)
         
         # Ordenar por quantidade de fornecedores
         resultado = list(cidades.values())
@@ -134,66 +243,56 @@ class FornecedorViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def estatisticas(self, request):
         """Estatísticas gerais dos fornecedores"""
+        from contas.models import ContaPagar
         fornecedores = self.get_queryset()
         
-        # Estatísticas básicas
-        total_fornecedores = fornecedores.count()
-        fornecedores_ativos = fornecedores.filter(status='ativo').count()
-        fornecedores_favoritos = fornecedores.filter(favorito=True).count()
-        
-        # Por tipo
-        pf_count = fornecedores.filter(tipo='pf').count()
-        pj_count = fornecedores.filter(tipo='pj').count()
-        
-        # Por status
-        inativos_count = fornecedores.filter(status='inativo').count()
-        suspensos_count = fornecedores.filter(status='suspenso').count()
-        
-        # Top fornecedores por valor de contas
-        from contas.models import ContaPagar
-        from django.db.models import Sum
+        # Todas as contagens em uma única consulta
+        contagens = fornecedores.aggregate(
+            total=Count('id'),
+            ativos=Count('id', filter=Q(status='ativo')),
+            inativos=Count('id', filter=Q(status='inativo')),
+            suspensos=Count('id', filter=Q(status='suspenso')),
+            favoritos=Count('id', filter=Q(favorito=True)),
+            pessoa_fisica=Count('id', filter=Q(tipo='pf')),
+            pessoa_juridica=Count('id', filter=Q(tipo='pj'))
+        )
         
-        top_fornecedores = []
-        for fornecedor in fornecedores:
-            total_contas = ContaPagar.objects.filter(
-                fornecedor=fornecedor,
+        # Top 10 fornecedores por valor de contas pendentes, ordenados e limitados no banco
+        top_fornecedores = [
+            {
+                'id': linha['fornecedor_id'],
+                'nome': linha['nome'],
+                'total_contas': float(linha['total_contas']),
+                'quantidade_contas': linha['quantidade_contas']
+            }
+            for linha in ContaPagar.objects.filter(
+                fornecedor__in=fornecedores,
                 status='pendente'
-            ).aggregate(total=Sum('valor'))['total'] or 0
-            
-            if total_contas > 0:
-                top_fornecedores.append({
-                    'id': fornecedor.id,
-                    'nome': fornecedor.nome,
-                    'total_contas': float(total_contas),
-                    'quantidade_contas': ContaPagar.objects.filter(
-                        fornecedor=fornecedor,
-                        status='pendente'
-                    ).count()
-                })
-        
-        # Ordenar por total de contas
-        top_fornecedores.sort(key=lambda x: x['total_contas'], reverse=True)
-        top_fornecedores = top_fornecedores[:10]  # Top 10
+            ).order_by().values('fornecedor_id', nome=F('fornecedor__nome')).annotate(
+                total_contas=Sum('valor'),
+                quantidade_contas=Count('id')
+            ).filter(total_contas__gt=0).order_by('-total_contas', 'nome')[:10]
+        ]
         
         return Response({
             'resumo': {
-                'total_fornecedores': total_fornecedores,
-                'fornecedores_ativos': fornecedores_ativos,
-                'fornecedores_favoritos': fornecedores_favoritos,
-                'pessoa_fisica': pf_count,
-                'pessoa_juridica': pj_count,
-                'inativos': inativos_count,
-                'suspensos': suspensos_count
+                'total_fornecedores': contagens['total'],
+                'fornecedores_ativos': contagens['ativos'],
+                'fornecedores_favoritos': contagens['favoritos'],
+                'pessoa_fisica': contagens['pessoa_fisica'],
+                'pessoa_juridica': contagens['pessoa_juridica'],
+                'inativos': contagens['inativos'],
+                'suspensos': contagens['suspensos']
             },
             'top_fornecedores': top_fornecedores,
             'distribuicao_tipo': {
-                'pessoa_fisica': pf_count,
-                'pessoa_juridica': pj_count
+                'pessoa_fisica': contagens['pessoa_fisica'],
+                'pessoa_juridica': contagens['pessoa_juridica']
             },
             'distribuicao_status': {
-                'ativo': fornecedores_ativos,
-                'inativo': inativos_count,
-                'suspenso': suspensos_count
+                'ativo': contagens['ativos'],
+                'inativo': contagens['inativos'],
+                'suspenso': contagens['suspensos']
             }
         })
 
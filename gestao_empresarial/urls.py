@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from contas.views import ContaPagarViewSet, DespesaDiariaViewSet, CategoriaViewSet, RelatorioViewSet
+from contas.views import ContaPagarViewSet, DespesaDiariaViewSet, CategoriaViewSet, RelatorioViewSet, TarefaRelatorioViewSet
 from senhas.views import GerenciadorSenhasViewSet
 from fornecedores.views import FornecedorViewSet, ContatoFornecedorViewSet, CategoriaFornecedorViewSet
 from usuarios.views import PerfilUsuarioViewSet, PermissaoViewSet, GrupoPermissaoViewSet
@@ -12,6 +12,7 @@ router.register(r'contas/contas-pagar', ContaPagarViewSet, basename='contapagar'
 router.register(r'contas/despesas', DespesaDiariaViewSet, basename='despesadiaria')
 router.register(r'contas/categorias', CategoriaViewSet, basename='categoria')
 router.register(r'contas/relatorios', RelatorioViewSet, basename='relatorio')
+router.register(r'contas/relatorios-tarefas', TarefaRelatorioViewSet, basename='tarefarelatorio')
 router.register(r'senhas/senhas', GerenciadorSenhasViewSet, basename='senha')
 router.register(r'fornecedores/fornecedores', FornecedorViewSet, basename='fornecedor')
 router.register(r'fornecedores/contatos', ContatoFornecedorViewSet, basename='contatofornecedor')
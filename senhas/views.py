@@ -7,6 +7,7 @@ from django.http import FileResponse, Http404
 from django.shortcuts import get_object_or_404
 from django.contrib import messages
 from core.middleware import require_admin_or_senhas_permission
+from core.pagination import PaginacaoCursor
 from .models import GerenciadorSenhas
 from .serializers import GerenciadorSenhasSerializer, GerenciadorSenhasListSerializer
 import logging
@@ -15,6 +16,8 @@ logger = logging.getLogger(__name__)
 
 class GerenciadorSenhasViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    pagination_class = PaginacaoCursor
+    ordenacao_cursor = ('-atualizado_em', 'id')
     
     def get_queryset(self):
         # Verificar permissões